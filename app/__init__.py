@@ -32,5 +32,11 @@ def create_app(config_class=Config):
     from app.items.routes import bp as items_bp
     app.register_blueprint(items_bp, url_prefix='/api')
     
+    from app.search.routes import bp as search_bp
+    app.register_blueprint(search_bp, url_prefix='/api')
+    
+    from app.jobs.routes import bp as jobs_bp
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    
     return app
 
@@ -1,12 +1,80 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from app import db
 from app.models import FarmerBill, DealerBill, FarmerBillItem, DealerBillItem
 from app.utils.calculations import calculate_farmer_bill_totals, calculate_dealer_bill_totals
-from app.utils.pdf_generator import generate_farmer_bill_pdf, generate_dealer_bill_pdf
+from app.utils.pdf_generator import (
+    format_farmer_bill_for_pdf, format_dealer_bill_for_pdf,
+    FARMER_TEMPLATE_VERSION, DEALER_TEMPLATE_VERSION
+)
+from app.utils.pdf_cache import get_pdf_cache
+from app.utils.pdf_pool import render_bill_pdf, get_pdf_pool, PdfPoolBusy, PdfRenderTimeout
+from app.utils.pdf_batch import build_batch_query, batch_zip_entries, batch_zip_filename, iter_bill_pdfs, stream_zip
+from app.utils.pagination import parse_limit, apply_keyset_page
+from app.utils.bill_ingest import bulk_create_bills, MAX_BULK_BILLS
+from app.utils.bill_audit import audit_bill_totals
+from app.utils.bill_summary import record_bill_totals, rebuild_bill_summaries
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+from io import BytesIO
+import click
+import csv
 import uuid
 
-bp = Blueprint('billing', __name__)
+bp = Blueprint('billing', __name__, cli_group='bills')
+
+
+def _bulk_create_response(kind):
+    """Shared handler for the bulk bill endpoints"""
+    try:
+        data = request.get_json()
+        payloads = data.get('bills') if isinstance(data, dict) else data
+        
+        if not isinstance(payloads, list) or not payloads:
+            return jsonify({'error': 'A non-empty list of bills is required'}), 400
+        if len(payloads) > MAX_BULK_BILLS:
+            return jsonify({'error': f'At most {MAX_BULK_BILLS} bills per request'}), 400
+        
+        results = bulk_create_bills(kind, payloads)
+        created = sum(1 for r in results if r['status'] == 'created')
+        
+        return jsonify({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 201 if created else 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+def _pdf_batch_response(kind, bill_model):
+    """
+    Shared handler for the batch PDF endpoints.
+
+    Accepts ``bill_ids`` (JSON list or comma separated) or a
+    ``date_from``/``date_to`` range and streams a ZIP of bill PDFs while
+    they are still being rendered. Bills that fail to render are listed
+    in the archive's ``errors.txt`` instead of cutting the download short.
+    """
+    try:
+        params = request.get_json(silent=True) or request.args
+        bill_ids = params.get('bill_ids')
+        date_from = params.get('date_from')
+        date_to = params.get('date_to')
+        
+        # Server-side batches keep memory flat however many bills match
+        bills = build_batch_query(bill_model, bill_ids, date_from, date_to).yield_per(100)
+        pdfs = iter_bill_pdfs(kind, bills, get_pdf_pool(), get_pdf_cache())
+        entries = batch_zip_entries(kind, pdfs)
+        
+        filename = batch_zip_filename(kind, date_from, date_to)
+        return Response(
+            stream_with_context(stream_zip(entries)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
 
 # ============ FARMER BILLS ============
 
@@ -61,6 +129,7 @@ def create_farmer_bill():
             )
             db.session.add(item)
         
+        record_bill_totals('farmer', [{'date': bill.date, **totals}])
         db.session.commit()
         
         return jsonify(bill.to_dict()), 201
@@ -68,14 +137,28 @@ def create_farmer_bill():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/farmer-bills/bulk', methods=['POST'])
+def create_farmer_bills_bulk():
+    """Create many farmer bills in one transaction with per-row results"""
+    return _bulk_create_response('farmer')
+
 @bp.route('/farmer-bills', methods=['GET'])
 def get_farmer_bills():
-    """Get all farmer bills with optional filters"""
+    """
+    Get farmer bills with optional filters.
+
+    Passing ``limit`` or ``cursor`` switches to keyset pagination over
+    (date, id) and returns ``{'bills': [...], 'next_cursor': ...}``.
+    ``view=summary`` returns header columns only, without items.
+    """
     try:
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         customer_name = request.args.get('customer_name')
         bill_id = request.args.get('bill_id')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit')
+        include_items = request.args.get('view') != 'summary'
         
         query = FarmerBill.query
         
@@ -87,12 +170,27 @@ def get_farmer_bills():
             query = query.filter(FarmerBill.customer_name.ilike(f'%{customer_name}%'))
         if bill_id:
             query = query.filter(FarmerBill.bill_id.ilike(f'%{bill_id}%'))
+        if include_items:
+            # Load items for the whole page in one IN query instead of one per bill
+            query = query.options(selectinload(FarmerBill.items))
+        
+        if cursor or limit:
+            bills, next_cursor = apply_keyset_page(query, FarmerBill.date, FarmerBill.id, cursor, parse_limit(limit))
+            return jsonify({
+                'bills': [bill.to_dict(include_items=include_items) for bill in bills],
+                'next_cursor': next_cursor
+            }), 200
         
         bills = query.order_by(FarmerBill.date.desc()).all()
-        return jsonify([bill.to_dict() for bill in bills]), 200
+        return jsonify([bill.to_dict(include_items=include_items) for bill in bills]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/farmer-bills/pdf-batch', methods=['GET', 'POST'])
+def get_farmer_bills_pdf_batch():
+    """Download many farmer bill PDFs as one streamed ZIP"""
+    return _pdf_batch_response('farmer', FarmerBill)
+
 @bp.route('/farmer-bills/<bill_id>', methods=['GET'])
 def get_farmer_bill(bill_id):
     """Get a specific farmer bill by bill_id"""
@@ -107,27 +205,23 @@ def get_farmer_bill_pdf(bill_id):
     """Generate PDF for farmer bill"""
     try:
         bill = FarmerBill.query.filter_by(bill_id=bill_id).first_or_404()
-        bill_dict = bill.to_dict()
-        
-        # Format dates and numbers for PDF
-        bill_dict['date'] = bill.date.strftime('%Y-%m-%d')
-        for item in bill_dict['items']:
-            item['weight'] = f"{item['weight']:.2f}"
-            item['price'] = f"{item['price']:.2f}"
-            item['item_total'] = f"{item['item_total']:.2f}"
-        bill_dict['other_expense'] = f"{bill_dict['other_expense']:.2f}"
-        bill_dict['discount'] = f"{bill_dict['discount']:.2f}"
-        bill_dict['final_total'] = f"{bill_dict['final_total']:.2f}"
+        bill_dict = format_farmer_bill_for_pdf(bill)
         
-        pdf_buffer = generate_farmer_bill_pdf(bill_dict)
-        pdf_buffer.seek(0)
+        pdf_bytes = get_pdf_cache().get_or_render(
+            'farmer', FARMER_TEMPLATE_VERSION, bill_dict,
+            lambda: render_bill_pdf('farmer', bill_dict)
+        )
         
         return send_file(
-            pdf_buffer,
+            BytesIO(pdf_bytes),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'farmer_bill_{bill_id}.pdf'
         )
+    except PdfPoolBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except PdfRenderTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -159,6 +253,7 @@ def create_dealer_bill():
             discount=discount,
             gst_percentage=gst_percentage,
             gst_amount=totals['gst_amount'],
+            cgst=totals['cgst'],
             sgst=totals['sgst'],
             grand_total=totals['grand_total'],
             
@@ -188,6 +283,7 @@ def create_dealer_bill():
             )
             db.session.add(item)
         
+        record_bill_totals('dealer', [{'date': bill.date, **totals}])
         db.session.commit()
         
         return jsonify(bill.to_dict()), 201
@@ -195,14 +291,28 @@ def create_dealer_bill():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/dealer-bills/bulk', methods=['POST'])
+def create_dealer_bills_bulk():
+    """Create many dealer bills in one transaction with per-row results"""
+    return _bulk_create_response('dealer')
+
 @bp.route('/dealer-bills', methods=['GET'])
 def get_dealer_bills():
-    """Get all dealer bills with optional filters"""
+    """
+    Get dealer bills with optional filters.
+
+    Passing ``limit`` or ``cursor`` switches to keyset pagination over
+    (date, id) and returns ``{'bills': [...], 'next_cursor': ...}``.
+    ``view=summary`` returns header columns only, without items.
+    """
     try:
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         customer_name = request.args.get('customer_name')
         bill_id = request.args.get('bill_id')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit')
+        include_items = request.args.get('view') != 'summary'
         
         query = DealerBill.query
         
@@ -214,12 +324,27 @@ def get_dealer_bills():
             query = query.filter(DealerBill.customer_name.ilike(f'%{customer_name}%'))
         if bill_id:
             query = query.filter(DealerBill.bill_id.ilike(f'%{bill_id}%'))
+        if include_items:
+            # Load items for the whole page in one IN query instead of one per bill
+            query = query.options(selectinload(DealerBill.items))
+        
+        if cursor or limit:
+            bills, next_cursor = apply_keyset_page(query, DealerBill.date, DealerBill.id, cursor, parse_limit(limit))
+            return jsonify({
+                'bills': [bill.to_dict(include_items=include_items) for bill in bills],
+                'next_cursor': next_cursor
+            }), 200
         
         bills = query.order_by(DealerBill.date.desc()).all()
-        return jsonify([bill.to_dict() for bill in bills]), 200
+        return jsonify([bill.to_dict(include_items=include_items) for bill in bills]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/dealer-bills/pdf-batch', methods=['GET', 'POST'])
+def get_dealer_bills_pdf_batch():
+    """Download many dealer bill PDFs as one streamed ZIP"""
+    return _pdf_batch_response('dealer', DealerBill)
+
 @bp.route('/dealer-bills/<bill_id>', methods=['GET'])
 def get_dealer_bill(bill_id):
     """Get a specific dealer bill by bill_id"""
@@ -234,31 +359,77 @@ def get_dealer_bill_pdf(bill_id):
     """Generate PDF for dealer bill"""
     try:
         bill = DealerBill.query.filter_by(bill_id=bill_id).first_or_404()
-        bill_dict = bill.to_dict()
+        bill_dict = format_dealer_bill_for_pdf(bill)
         
-        # Format dates and numbers for PDF
-        bill_dict['date'] = bill.date.strftime('%Y-%m-%d')
-        for item in bill_dict['items']:
-            item['weight'] = f"{item['weight']:.2f}"
-            item['price'] = f"{item['price']:.2f}"
-            item['item_total'] = f"{item['item_total']:.2f}"
-        bill_dict['other_expense'] = f"{bill_dict['other_expense']:.2f}"
-        bill_dict['discount'] = f"{bill_dict['discount']:.2f}"
-        bill_dict['gst_percentage'] = f"{bill_dict['gst_percentage']:.2f}"
-        bill_dict['gst_amount'] = f"{bill_dict['gst_amount']:.2f}"
-        bill_dict['cgst'] = f"{bill_dict['cgst']:.2f}"
-        bill_dict['sgst'] = f"{bill_dict['sgst']:.2f}"
-        bill_dict['grand_total'] = f"{bill_dict['grand_total']:.2f}"
-        
-        pdf_buffer = generate_dealer_bill_pdf(bill_dict)
-        pdf_buffer.seek(0)
+        pdf_bytes = get_pdf_cache().get_or_render(
+            'dealer', DEALER_TEMPLATE_VERSION, bill_dict,
+            lambda: render_bill_pdf('dealer', bill_dict)
+        )
         
         return send_file(
-            pdf_buffer,
+            BytesIO(pdf_bytes),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'dealer_bill_{bill_id}.pdf'
         )
+    except PdfPoolBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except PdfRenderTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/pdf-cache/stats', methods=['GET'])
+def get_pdf_cache_stats():
+    """Hit/miss counters and disk usage of the bill PDF cache"""
+    try:
+        return jsonify(get_pdf_cache().stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+# ============ CLI ============
+
+@bp.cli.command('audit-totals')
+@click.option('--kind', type=click.Choice(['farmer', 'dealer', 'all']), default='all')
+@click.option('--fix', is_flag=True, help='Write recomputed totals back to the database')
+@click.option('--chunk-size', default=5000, show_default=True, help='Bills per chunk')
+@click.option('--tolerance', default=0, show_default=True, help='Ignore differences up to this many paise')
+@click.option('--date-from', type=click.DateTime(['%Y-%m-%d']), default=None)
+@click.option('--date-to', type=click.DateTime(['%Y-%m-%d']), default=None)
+@click.option('--report', type=click.File('w'), default='-', help='CSV file for mismatches (default stdout)')
+def audit_totals_command(kind, fix, chunk_size, tolerance, date_from, date_to, report):
+    """Recompute stored bill totals from items and report drift"""
+    writer = csv.DictWriter(report, fieldnames=['kind', 'bill_id', 'item_id', 'field', 'stored', 'expected'])
+    writer.writeheader()
+    
+    kinds = ['farmer', 'dealer'] if kind == 'all' else [kind]
+    for k in kinds:
+        summary = audit_bill_totals(
+            k, chunk_size=chunk_size, fix=fix, tolerance=tolerance,
+            date_from=date_from.date() if date_from else None,
+            date_to=date_to.date() if date_to else None,
+            on_mismatch=writer.writerow
+        )
+        click.echo(
+            f"{k}: {summary['bills']} bills, {summary['items']} items checked; "
+            f"{summary['bill_mismatches']} bills and {summary['item_mismatches']} items differ; "
+            f"{summary['fixed']} rows fixed",
+            err=True
+        )
+        if summary['fixed']:
+            rebuild_bill_summaries(
+                k, date_from.date() if date_from else None, date_to.date() if date_to else None
+            )
+
+@bp.cli.command('rebuild-summary')
+@click.option('--kind', type=click.Choice(['farmer', 'dealer', 'all']), default='all')
+@click.option('--date-from', type=click.DateTime(['%Y-%m-%d']), default=None)
+@click.option('--date-to', type=click.DateTime(['%Y-%m-%d']), default=None)
+def rebuild_summary_command(kind, date_from, date_to):
+    """Recompute the daily bill summary table from the bill tables"""
+    kinds = ['farmer', 'dealer'] if kind == 'all' else [kind]
+    for k in kinds:
+        count = rebuild_bill_summaries(
+            k, date_from.date() if date_from else None, date_to.date() if date_to else None
+        )
+        click.echo(f'{k}: {count} daily summary rows written', err=True)
@@ -1,12 +1,54 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from app import db
 from app.models import Deal, Installment, Payment, PaymentAllocation
-from app.utils.interest_calculations import update_accrued_interest, allocate_payment_to_installments
+from app.utils.interest_calculations import (
+    compute_accrued_interest, update_accrued_interest, allocate_payment_to_installments,
+    accrue_interest_batch
+)
+from app.utils.interest_projection import simulate_deal_payments, simulate_portfolio_payoff
+from app.utils.deal_balances import add_installments_to_balance, check_deal_balances
+from app.utils.payment_import import import_statement_payments, REPORT_FIELDS
+from app.utils.deal_ledger import get_ledger_page, iter_ledger_rows, LEDGER_COLUMNS, LEDGER_FIELDS
+from app.utils.pagination import parse_limit
+from app.reports.exports import EXPORT_MIMETYPES, iter_csv, iter_ndjson
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy.orm import selectinload
+from datetime import date, datetime, timedelta
+from io import StringIO
+import click
+import csv
 import uuid
 
-bp = Blueprint('deals', __name__)
+bp = Blueprint('deals', __name__, cli_group='deals')
+
+# ``sort`` values accepted by GET /deals
+DEAL_SORTS = {
+    'deal_date': [Deal.deal_date.desc()],
+    'outstanding': [Deal.outstanding_principal.desc()],
+    'next_due_date': [Deal.next_due_date.asc().nulls_last()],
+}
+
+# Loads a deal's installments, payments and allocations with one IN query
+# per level, so serializing any number of deals takes four queries
+DEAL_GRAPH = (
+    selectinload(Deal.installments),
+    selectinload(Deal.payments).selectinload(Payment.allocations),
+)
+
+# Hypothetical payment dates accepted per simulation request
+MAX_SIMULATION_DATES = 366
+
+
+def _simulation_params():
+    """Simulation parameters from a JSON body or the query string"""
+    params = request.get_json(silent=True) or request.args
+    payment_dates = params.get('payment_dates') or date.today().isoformat()
+    if isinstance(payment_dates, str):
+        payment_dates = [d for d in payment_dates.split(',') if d.strip()]
+    if len(payment_dates) > MAX_SIMULATION_DATES:
+        raise ValueError(f'At most {MAX_SIMULATION_DATES} payment dates per request')
+    payment_dates = [datetime.strptime(d.strip(), '%Y-%m-%d').date() for d in payment_dates]
+    return params, payment_dates
 
 
 @bp.route('/deals', methods=['POST'])
@@ -31,6 +73,7 @@ def create_deal():
         db.session.flush()
         
         # Create installments if provided
+        installments = []
         if 'installments' in data and data['installments']:
             for idx, inst_data in enumerate(data['installments'], 1):
                 installment = Installment(
@@ -43,7 +86,9 @@ def create_deal():
                     sequence_number=idx
                 )
                 db.session.add(installment)
+                installments.append(installment)
         
+        add_installments_to_balance(deal, installments)
         db.session.commit()
         
         # Update accrued interest (will be 0 for new deal, but ensures interest row exists)
@@ -68,7 +113,7 @@ def get_deals():
         deal_number = request.args.get('deal_number')
         status = request.args.get('status')
         
-        query = Deal.query
+        query = Deal.query.options(*DEAL_GRAPH)
         
         if date_from:
             query = query.filter(Deal.deal_date >= datetime.strptime(date_from, '%Y-%m-%d').date())
@@ -81,17 +126,29 @@ def get_deals():
         if status:
             query = query.filter(Deal.status == status)
         
-        deals = query.order_by(Deal.deal_date.desc()).all()
-        
-        # Update accrued interest for each deal before returning
-        for deal in deals:
-            update_accrued_interest(deal.id)
-        
-        # Refresh deals to get updated data
-        for deal in deals:
-            db.session.refresh(deal)
-        
-        return jsonify([deal.to_dict() for deal in deals]), 200
+        # Filters and sorting on the stored balances (indexed with status)
+        min_outstanding = request.args.get('min_outstanding')
+        max_outstanding = request.args.get('max_outstanding')
+        due_before = request.args.get('due_before')
+        if min_outstanding:
+            query = query.filter(Deal.outstanding_principal >= float(min_outstanding))
+        if max_outstanding:
+            query = query.filter(Deal.outstanding_principal <= float(max_outstanding))
+        if due_before:
+            query = query.filter(Deal.next_due_date < datetime.strptime(due_before, '%Y-%m-%d').date())
+        
+        sort = request.args.get('sort', 'deal_date')
+        if sort not in DEAL_SORTS:
+            return jsonify({'error': f"Unsupported sort: {sort}. Expected one of: {', '.join(DEAL_SORTS)}"}), 400
+        
+        deals = query.order_by(*DEAL_SORTS[sort]).all()
+        
+        # Accrued interest is computed for the response only, not persisted
+        today = date.today()
+        return jsonify([
+            deal.to_dict(accrued_interest=compute_accrued_interest(deal, today), as_of=today)
+            for deal in deals
+        ]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -100,15 +157,11 @@ def get_deals():
 def get_deal(deal_id):
     """Get deal details with installments and payments"""
     try:
-        deal = Deal.query.get_or_404(deal_id)
+        deal = Deal.query.options(*DEAL_GRAPH).get_or_404(deal_id)
         
-        # Update accrued interest before returning
-        update_accrued_interest(deal.id)
-        
-        # Refresh to get updated data
-        db.session.refresh(deal)
-        
-        return jsonify(deal.to_dict()), 200
+        # Accrued interest is computed for the response only, not persisted
+        today = date.today()
+        return jsonify(deal.to_dict(accrued_interest=compute_accrued_interest(deal, today), as_of=today)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -147,7 +200,11 @@ def update_deal(deal_id):
 def create_installments(deal_id):
     """Create installments for a deal"""
     try:
-        deal = Deal.query.get_or_404(deal_id)
+        # Deal row lock first, like payment posting, so the balance update
+        # below cannot overwrite a concurrently posted payment
+        deal = db.session.get(Deal, deal_id, with_for_update=True, populate_existing=True)
+        if not deal:
+            return jsonify({'error': 'Deal not found'}), 404
         data = request.get_json()
         
         installments_data = data.get('installments', [])
@@ -155,6 +212,7 @@ def create_installments(deal_id):
         # Get current max sequence number
         max_seq = db.session.query(func.max(Installment.sequence_number)).filter_by(deal_id=deal_id).scalar() or 0
         
+        installments = []
         for idx, inst_data in enumerate(installments_data, 1):
             installment = Installment(
                 deal_id=deal.id,
@@ -166,7 +224,9 @@ def create_installments(deal_id):
                 sequence_number=max_seq + idx
             )
             db.session.add(installment)
+            installments.append(installment)
         
+        add_installments_to_balance(deal, installments)
         db.session.commit()
         
         # Update accrued interest
@@ -179,24 +239,78 @@ def create_installments(deal_id):
         return jsonify({'error': str(e)}), 400
 
 
+@bp.route('/deals/payments/import', methods=['POST'])
+def import_payments():
+    """
+    Post the credits of an uploaded bank statement (CSV or Excel) to deals.
+    
+    Form fields: ``file`` (the statement), optional ``dry_run`` (match
+    only) and ``format`` ('json' or 'csv' for the reconciliation report).
+    """
+    try:
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({'error': 'A statement file is required'}), 400
+        dry_run = (request.values.get('dry_run') or '').lower() in ('1', 'true', 'yes')
+        fmt = request.values.get('format', 'json')
+        
+        rows = []
+        summary = import_statement_payments(upload.stream, upload.filename, dry_run=dry_run, on_row=rows.append)
+        
+        if fmt == 'csv':
+            report = StringIO()
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+            return Response(
+                report.getvalue(),
+                mimetype='text/csv',
+                headers={'Content-Disposition': 'attachment; filename=payment_import_report.csv'}
+            )
+        
+        return jsonify({'dry_run': dry_run, 'summary': summary, 'rows': rows}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
 @bp.route('/deals/<deal_id>/payments', methods=['POST'])
 def add_payment(deal_id):
-    """Add a payment and allocate it to installments"""
+    """
+    Add a payment and allocate it to installments.
+    
+    Clients may send an ``Idempotency-Key`` header (or ``idempotency_key``
+    in the body); retrying with the same key returns the original
+    allocation with status 200 instead of posting the payment twice.
+    """
     try:
         deal = Deal.query.get_or_404(deal_id)
         data = request.get_json()
         
         payment_amount = data['amount']
         payment_date = datetime.strptime(data['payment_date'], '%Y-%m-%d').date()
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key and len(idempotency_key) > 255:
+            return jsonify({'error': 'Idempotency key must be at most 255 characters'}), 400
         
         # Allocate payment
-        result = allocate_payment_to_installments(deal_id, payment_amount, payment_date)
+        deal_uuid = deal.id
+        result = allocate_payment_to_installments(
+            deal_uuid, payment_amount, payment_date, idempotency_key=idempotency_key
+        )
         
         if result is None:
             return jsonify({'error': 'Failed to allocate payment'}), 400
         
-        # Refresh deal to get updated data
-        db.session.refresh(deal)
+        # Reload the deal graph with one query per relationship level
+        deal = Deal.query.options(*DEAL_GRAPH).filter(Deal.id == deal_uuid).one()
+        
+        if result['replayed']:
+            return jsonify({
+                'message': 'Payment already posted',
+                'allocation': result,
+                'deal': deal.to_dict()
+            }), 200
         
         return jsonify({
             'message': 'Payment added successfully',
@@ -208,56 +322,169 @@ def add_payment(deal_id):
         return jsonify({'error': str(e)}), 400
 
 
-@bp.route('/deals/<deal_id>/ledger', methods=['GET'])
-def get_deal_ledger(deal_id):
-    """Get complete ledger for a deal (installments + payments)"""
+@bp.route('/deals/<deal_id>/accrue-interest', methods=['POST'])
+def accrue_deal_interest(deal_id):
+    """Persist accrued interest on the deal's interest installment"""
     try:
         deal = Deal.query.get_or_404(deal_id)
-        
-        # Update accrued interest
-        update_accrued_interest(deal.id)
+        accrued = update_accrued_interest(deal.id)
         db.session.refresh(deal)
         
-        # Build ledger entries
-        ledger = []
-        
-        # Add installments
-        for inst in deal.installments:
-            ledger.append({
-                'date': inst.due_date.isoformat(),
-                'type': 'installment',
-                'description': f"Installment #{inst.sequence_number} - Due",
-                'amount': float(inst.amount),
-                'pending': float(inst.pending_amount),
-                'status': inst.status,
-                'id': str(inst.id)
-            })
-        
-        # Add payments
-        for payment in deal.payments:
-            ledger.append({
-                'date': payment.payment_date.isoformat(),
-                'type': 'payment',
-                'description': f"Payment - {payment.remark or 'No remark'}",
-                'amount': -float(payment.amount),  # Negative for payment
-                'id': str(payment.id)
-            })
-        
-        # Sort by date
-        ledger.sort(key=lambda x: x['date'])
-        
-        # Calculate running balance
-        balance = float(deal.total_amount)
-        for entry in ledger:
-            if entry['type'] == 'installment':
-                balance = entry['pending']
-            elif entry['type'] == 'payment':
-                balance -= abs(entry['amount'])
-            entry['balance'] = balance
+        return jsonify({
+            'accrued_interest': float(accrued),
+            'deal': deal.to_dict()
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/deals/<deal_id>/simulate', methods=['GET', 'POST'])
+def simulate_deal(deal_id):
+    """What-if: interest realized if the deal is paid on each given date"""
+    try:
+        deal = Deal.query.get_or_404(deal_id)
+        params, payment_dates = _simulation_params()
+        amount = params.get('amount')
+        detail = str(params.get('detail', '')).lower() in ('1', 'true')
+        
+        return jsonify({
+            'deal_id': str(deal.id),
+            'simulations': simulate_deal_payments(
+                deal, payment_dates, amount=float(amount) if amount not in (None, '') else None, detail=detail
+            )
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/deals/simulate', methods=['GET', 'POST'])
+def simulate_portfolio():
+    """What-if: interest realized if every matching deal is paid off on each given date"""
+    try:
+        params, payment_dates = _simulation_params()
+        deal_ids = params.get('deal_ids')
+        if isinstance(deal_ids, str):
+            deal_ids = [d.strip() for d in deal_ids.split(',') if d.strip()]
+        
+        return jsonify({
+            'simulations': simulate_portfolio_payoff(
+                payment_dates,
+                status=params.get('status', 'active') or None,
+                deal_ids=deal_ids,
+                top=int(params.get('top', 0))
+            )
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/deals/<deal_id>/ledger', methods=['GET'])
+def get_deal_ledger(deal_id):
+    """
+    Get the ledger for a deal (installments + payments).
+    
+    Entries are merged and ordered in SQL (date, installments before
+    payments on the same day) with a running ``balance`` of amounts due
+    less payments. ``date_from``/``date_to`` restrict the range; the
+    balance still includes everything before it.
+    
+    Passing ``limit`` or ``cursor`` switches to cursor pagination and
+    returns the deal with its stored balances (no installments, payments
+    or read-time interest) plus ``next_cursor``. ``format=csv`` or ``ndjson`` streams the whole
+    (date-filtered) ledger as a download.
+    """
+    try:
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit')
+        fmt = request.args.get('format', 'json')
+        
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        
+        if fmt in ('csv', 'ndjson'):
+            deal = Deal.query.get_or_404(deal_id)
+            rows = iter_ledger_rows(deal.id, date_from, date_to)
+            if fmt == 'csv':
+                chunks = iter_csv(LEDGER_COLUMNS, rows)
+            else:
+                chunks = iter_ndjson(LEDGER_FIELDS, rows)
+            return Response(
+                stream_with_context(chunks),
+                mimetype=EXPORT_MIMETYPES[fmt],
+                headers={'Content-Disposition': f'attachment; filename=ledger_{deal.deal_number}.{fmt}'}
+            )
+        if fmt != 'json':
+            return jsonify({'error': f'Unsupported format: {fmt}. Expected one of: json, csv, ndjson'}), 400
+        
+        if cursor or limit:
+            # Stored balances only, so nothing here grows with the deal's age
+            deal = Deal.query.get_or_404(deal_id)
+            ledger, next_cursor = get_ledger_page(deal.id, date_from, date_to, cursor, parse_limit(limit))
+            return jsonify({
+                'deal': deal.to_dict(include_items=False),
+                'ledger': ledger,
+                'next_cursor': next_cursor
+            }), 200
+        
+        deal = Deal.query.options(*DEAL_GRAPH).get_or_404(deal_id)
+        
+        # Accrued interest is computed for the response only, not persisted
+        today = date.today()
+        deal_data = deal.to_dict(accrued_interest=compute_accrued_interest(deal, today), as_of=today)
+        ledger, _ = get_ledger_page(deal.id, date_from, date_to)
         
         return jsonify({
-            'deal': deal.to_dict(),
+            'deal': deal_data,
             'ledger': ledger
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
+
+
+# ============ CLI ============
+
+@bp.cli.command('accrue-interest')
+@click.option('--as-of', type=click.DateTime(['%Y-%m-%d']), default=None, help='Accrue up to this date (default today)')
+@click.option('--chunk-size', default=5000, show_default=True, help='Deals per statement')
+def accrue_interest_command(as_of, chunk_size):
+    """Persist accrued interest for every active deal"""
+    summary = accrue_interest_batch(as_of=as_of.date() if as_of else None, chunk_size=chunk_size)
+    click.echo(f"{summary['deals']} deals accrued in {summary['chunks']} chunks", err=True)
+
+
+@bp.cli.command('check-balances')
+@click.option('--fix', is_flag=True, help='Write recomputed balances back to the database')
+@click.option('--chunk-size', default=5000, show_default=True, help='Deals per chunk')
+@click.option('--report', type=click.File('w'), default='-', help='CSV file for mismatches (default stdout)')
+def check_balances_command(fix, chunk_size, report):
+    """Recompute stored deal balances from installments and payments"""
+    writer = csv.DictWriter(report, fieldnames=['deal_number', 'field', 'stored', 'expected'])
+    writer.writeheader()
+    summary = check_deal_balances(chunk_size=chunk_size, fix=fix, on_mismatch=writer.writerow)
+    click.echo(
+        f"{summary['deals']} deals checked; {summary['mismatches']} differ; {summary['fixed']} fixed",
+        err=True
+    )
+
+
+@bp.cli.command('import-payments')
+@click.argument('statement', type=click.File('rb'))
+@click.option('--dry-run', is_flag=True, help='Match rows and find duplicates without posting')
+@click.option('--batch-rows', default=500, show_default=True, help='Statement rows per transaction')
+@click.option('--report', type=click.File('w'), default='-', help='CSV reconciliation report (default stdout)')
+def import_payments_command(statement, dry_run, batch_rows, report):
+    """Post the credits of a bank statement (CSV or Excel) to deals"""
+    writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    summary = import_statement_payments(
+        statement, statement.name, dry_run=dry_run, batch_rows=batch_rows, on_row=writer.writerow
+    )
+    click.echo(
+        f"{summary['rows']} rows: {summary['matched']} matched, {summary['unmatched']} unmatched, "
+        f"{summary['duplicate']} duplicate, {summary['invalid']} invalid, {summary['error']} failed; "
+        f"{summary['amount_posted']:.2f} posted",
+        err=True
+    )
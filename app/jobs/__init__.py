@@ -0,0 +1 @@
+# Jobs blueprint package
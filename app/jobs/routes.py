@@ -0,0 +1,71 @@
+from flask import Blueprint, request, jsonify, send_file
+import click
+import os
+import uuid
+from app import db
+from app.models import ReportJob
+from app.jobs.worker import enqueue_job, run_worker, cleanup_jobs
+
+bp = Blueprint('jobs', __name__, cli_group='jobs')
+
+
+@bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a report/PDF job and return its id"""
+    try:
+        data = request.get_json()
+        job = enqueue_job(data.get('job_type'), data.get('params'))
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job status and progress"""
+    try:
+        job = ReportJob.query.get_or_404(uuid.UUID(job_id))
+        return jsonify(job.to_dict()), 200
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid job ID format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+
+@bp.route('/jobs/<job_id>/download', methods=['GET'])
+def download_job(job_id):
+    """Download the artifact of a finished job"""
+    try:
+        job = ReportJob.query.get_or_404(uuid.UUID(job_id))
+        if job.status != 'done':
+            return jsonify({'error': f'Job is {job.status}', 'job': job.to_dict()}), 409
+        if not job.result_path or not os.path.exists(job.result_path):
+            return jsonify({'error': 'Job artifact has expired'}), 410
+
+        return send_file(
+            job.result_path,
+            mimetype=job.result_mimetype,
+            as_attachment=True,
+            download_name=job.result_filename
+        )
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid job ID format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 404
+
+
+@bp.cli.command('worker')
+@click.option('--poll-interval', default=2.0, help='Seconds to wait when the queue is empty')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty')
+def worker_command(poll_interval, once):
+    """Run the background job worker"""
+    run_worker(poll_interval=poll_interval, once=once)
+
+
+@bp.cli.command('cleanup')
+@click.option('--retention-hours', type=int, default=None, help='Keep finished jobs this long')
+def cleanup_command(retention_hours):
+    """Delete expired job artifacts"""
+    result = cleanup_jobs(retention_hours=retention_hours)
+    click.echo(f"Removed {result['removed']} expired jobs, failed {result['stale']} stale jobs")
@@ -0,0 +1,54 @@
+from app.models import FarmerBill, DealerBill
+from app.reports.cache import cached_report_file
+from app.reports.exports import EXPORT_MIMETYPES, report_filename
+from app.utils.pdf_batch import build_batch_query, batch_zip_entries, batch_zip_filename, iter_bill_pdfs, stream_zip
+from app.utils.pdf_cache import get_pdf_cache
+from app.utils.pdf_pool import get_pdf_pool
+import shutil
+
+# Each runner takes (params, output, progress), writes the artifact to the
+# binary file ``output`` and returns (filename, mimetype). ``progress`` is a
+# callable(done, total).
+
+
+def _report_runner(kind):
+    def run(params, output, progress):
+        month = params.get('month')
+        year = params.get('year')
+        fmt = params.get('format', 'xlsx')
+        if fmt not in EXPORT_MIMETYPES:
+            raise ValueError(f'Unsupported format: {fmt}')
+        shutil.copyfileobj(cached_report_file(kind, fmt, month, year, progress=progress), output)
+        return report_filename(kind, month, year, fmt), EXPORT_MIMETYPES[fmt]
+    return run
+
+
+def _pdf_zip_runner(kind, bill_model):
+    def run(params, output, progress):
+        bill_ids = params.get('bill_ids')
+        date_from = params.get('date_from')
+        date_to = params.get('date_to')
+
+        query = build_batch_query(bill_model, bill_ids, date_from, date_to)
+        total = query.order_by(None).count()
+
+        def rendered():
+            pdfs = iter_bill_pdfs(kind, query.yield_per(100), get_pdf_pool(), get_pdf_cache())
+            for done, pdf in enumerate(pdfs, 1):
+                yield pdf
+                progress(done, total)
+
+        for chunk in stream_zip(batch_zip_entries(kind, rendered())):
+            output.write(chunk)
+        return batch_zip_filename(kind, date_from, date_to), 'application/zip'
+    return run
+
+
+JOB_RUNNERS = {
+    'farmer_report': _report_runner('farmer'),
+    'dealer_report': _report_runner('dealer'),
+    'farmer_hsn_report': _report_runner('farmer_hsn'),
+    'dealer_hsn_report': _report_runner('dealer_hsn'),
+    'farmer_pdf_zip': _pdf_zip_runner('farmer', FarmerBill),
+    'dealer_pdf_zip': _pdf_zip_runner('dealer', DealerBill),
+}
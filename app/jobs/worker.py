@@ -0,0 +1,221 @@
+from flask import current_app
+from app import db
+from app.models import ReportJob
+from app.jobs.runners import JOB_RUNNERS
+from sqlalchemy import func, update
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import time
+
+
+def enqueue_job(job_type, params):
+    """Queue a job and return it; raises ValueError for an unknown type"""
+    if job_type not in JOB_RUNNERS:
+        raise ValueError(f"Unknown job type: {job_type}. Expected one of: {', '.join(JOB_RUNNERS)}")
+    job = ReportJob(job_type=job_type, params=params or {}, status='queued', progress=0)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next_job(worker_name):
+    """
+    Atomically take the oldest queued job.
+
+    ``FOR UPDATE SKIP LOCKED`` lets several worker processes poll the same
+    table without handing the same job to two of them.
+    """
+    job = ReportJob.query.filter_by(status='queued') \
+        .order_by(ReportJob.created_at) \
+        .with_for_update(skip_locked=True) \
+        .first()
+    if job is None:
+        db.session.rollback()
+        return None
+
+    job.status = 'running'
+    job.started_at = job.heartbeat_at = datetime.utcnow()
+    job.worker = worker_name
+    db.session.commit()
+    return job
+
+
+def _progress_updater(job_id, heartbeat_interval=None):
+    """
+    Build a progress callback for a running job.
+
+    Updates go through their own short transaction so the runner's session
+    (and any server-side cursor it holds open) is left untouched. A row is
+    written when the percentage changes, and otherwise at most every
+    ``heartbeat_interval`` seconds to refresh ``heartbeat_at``, which is
+    what ``cleanup_jobs`` uses to tell a slow job from a dead worker.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = current_app.config.get('JOB_HEARTBEAT_INTERVAL', 30)
+    last = {'percent': -1, 'written': time.monotonic()}
+
+    def update_progress(done, total):
+        percent = 100 if not total else min(99, int(done * 100 / total))
+        now = time.monotonic()
+        if percent == last['percent'] and now - last['written'] < heartbeat_interval:
+            return
+        last['percent'] = percent
+        last['written'] = now
+        with db.engine.begin() as conn:
+            conn.execute(update(ReportJob).where(ReportJob.id == job_id).values(
+                progress=percent, heartbeat_at=datetime.utcnow()
+            ))
+
+    return update_progress
+
+
+def _owned_job(job_id, worker_name):
+    """UPDATE of a job that only matches while this worker still runs it"""
+    return update(ReportJob).where(
+        ReportJob.id == job_id,
+        ReportJob.status == 'running',
+        ReportJob.worker == worker_name
+    )
+
+
+@contextmanager
+def _heartbeat(job_id, worker_name, interval):
+    """
+    Refresh ``heartbeat_at`` from a daemon thread while the block runs.
+
+    Runners can go a long time without a progress callback (the COUNT and
+    first batch of a large export, or an HSN summary that reports only at
+    the end), so liveness cannot depend on progress alone.
+    """
+    engine = db.engine
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(_owned_job(job_id, worker_name).values(heartbeat_at=datetime.utcnow()))
+            except Exception:
+                # A missed beat is retried on the next tick
+                pass
+
+    thread = threading.Thread(target=beat, name=f'job-heartbeat-{job_id}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _finish_job(job_id, worker_name, **values):
+    """
+    Record a job's outcome.
+
+    Returns False when the job is no longer this worker's (``cleanup_jobs``
+    failed it as stale meanwhile), in which case nothing is written.
+    """
+    db.session.rollback()
+    result = db.session.execute(_owned_job(job_id, worker_name).values(finished_at=datetime.utcnow(), **values))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def run_job(job):
+    """Execute a claimed job and record its artifact or error"""
+    config = current_app.config
+    jobs_dir = config['JOBS_DIR']
+    os.makedirs(jobs_dir, exist_ok=True)
+    job_id, worker_name = job.id, job.worker
+    tmp_path = os.path.join(jobs_dir, f'{job_id}.part')
+    runner = JOB_RUNNERS[job.job_type]
+    # Several beats per stale window, so one slow UPDATE cannot get a live
+    # job failed
+    interval = min(config.get('JOB_HEARTBEAT_INTERVAL', 30), config.get('JOB_STALE_MINUTES', 60) * 60 / 3)
+
+    try:
+        with _heartbeat(job_id, worker_name, interval):
+            with open(tmp_path, 'wb') as output:
+                filename, mimetype = runner(job.params or {}, output, _progress_updater(job_id))
+        final_path = os.path.join(jobs_dir, f'{job_id}_{filename}')
+        os.replace(tmp_path, final_path)
+
+        finished = _finish_job(
+            job_id, worker_name,
+            status='done', progress=100, result_path=final_path,
+            result_filename=filename, result_mimetype=mimetype
+        )
+        if not finished:
+            os.remove(final_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _finish_job(job_id, worker_name, status='failed', error=str(e))
+    return db.session.get(ReportJob, job_id)
+
+
+def cleanup_jobs(retention_hours=None, stale_minutes=None):
+    """
+    Delete finished jobs past retention and fail jobs whose worker died.
+
+    A running job counts as dead once its heartbeat (refreshed by the
+    worker's heartbeat thread and by progress updates) is older than
+    ``stale_minutes``; how long it has been running does not matter.
+
+    Returns:
+        dict with counts of removed and failed-as-stale jobs
+    """
+    config = current_app.config
+    retention_hours = retention_hours if retention_hours is not None else config.get('JOB_RETENTION_HOURS', 24)
+    stale_minutes = stale_minutes if stale_minutes is not None else config.get('JOB_STALE_MINUTES', 60)
+    now = datetime.utcnow()
+
+    expired = ReportJob.query.filter(
+        ReportJob.status.in_(['done', 'failed']),
+        ReportJob.finished_at < now - timedelta(hours=retention_hours)
+    ).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+
+    stale = ReportJob.query.filter(
+        ReportJob.status == 'running',
+        func.coalesce(ReportJob.heartbeat_at, ReportJob.started_at) < now - timedelta(minutes=stale_minutes)
+    ).all()
+    for job in stale:
+        job.status = 'failed'
+        job.error = 'Worker stopped before the job finished'
+        job.finished_at = now
+
+    db.session.commit()
+    return {'removed': len(expired), 'stale': len(stale)}
+
+
+def run_worker(poll_interval=2.0, once=False):
+    """
+    Process queued jobs until interrupted.
+
+    Args:
+        poll_interval: Seconds to sleep when the queue is empty
+        once: Stop as soon as the queue is empty
+    """
+    worker_name = f'{socket.gethostname()}:{os.getpid()}'
+    cleanup_every = current_app.config.get('JOB_CLEANUP_INTERVAL', 600)
+    last_cleanup = 0
+
+    while True:
+        if time.monotonic() - last_cleanup > cleanup_every:
+            cleanup_jobs()
+            last_cleanup = time.monotonic()
+
+        job = claim_next_job(worker_name)
+        if job is not None:
+            run_job(job)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -1,12 +1,22 @@
 from app import db
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String, Date, Numeric, Text, DateTime, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, String, Date, Numeric, Text, DateTime, ForeignKey, Integer, BigInteger, Index, text
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
 import uuid
 
 class FarmerBill(db.Model):
     __tablename__ = 'farmer_bills'
+    __table_args__ = (
+        # Backs keyset pagination ordered by (date desc, id desc)
+        Index('ix_farmer_bills_date_id', 'date', 'id'),
+        # Trigram indexes for substring/fuzzy search (requires pg_trgm)
+        Index('ix_farmer_bills_customer_name_trgm', 'customer_name',
+              postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}),
+        Index('ix_farmer_bills_bill_id_trgm', 'bill_id',
+              postgresql_using='gin', postgresql_ops={'bill_id': 'gin_trgm_ops'}),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bill_id = Column(String, unique=True, nullable=False)
@@ -31,8 +41,8 @@ class FarmerBill(db.Model):
     
     items = relationship('FarmerBillItem', backref='farmer_bill', cascade='all, delete-orphan', lazy=True)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_items=True):
+        data = {
             'id': str(self.id),
             'bill_id': self.bill_id,
             'date': self.date.isoformat() if self.date else None,
@@ -51,12 +61,23 @@ class FarmerBill(db.Model):
             'receiver_state_code': self.receiver_state_code,
             'receiver_gstin': self.receiver_gstin,
             
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'items': [item.to_dict() for item in self.items]
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
 
 class DealerBill(db.Model):
     __tablename__ = 'dealer_bills'
+    __table_args__ = (
+        # Backs keyset pagination ordered by (date desc, id desc)
+        Index('ix_dealer_bills_date_id', 'date', 'id'),
+        # Trigram indexes for substring/fuzzy search (requires pg_trgm)
+        Index('ix_dealer_bills_customer_name_trgm', 'customer_name',
+              postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}),
+        Index('ix_dealer_bills_bill_id_trgm', 'bill_id',
+              postgresql_using='gin', postgresql_ops={'bill_id': 'gin_trgm_ops'}),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bill_id = Column(String, unique=True, nullable=False)
@@ -85,8 +106,8 @@ class DealerBill(db.Model):
     
     items = relationship('DealerBillItem', backref='dealer_bill', cascade='all, delete-orphan', lazy=True)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_items=True):
+        data = {
             'id': str(self.id),
             'bill_id': self.bill_id,
             'date': self.date.isoformat() if self.date else None,
@@ -108,12 +129,22 @@ class DealerBill(db.Model):
             'receiver_state_code': self.receiver_state_code,
             'receiver_gstin': self.receiver_gstin,
             
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'items': [item.to_dict() for item in self.items]
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
 
 class FarmerBillItem(db.Model):
     __tablename__ = 'farmer_bill_items'
+    __table_args__ = (
+        # Bill -> items lookups; also covers the HSN summary, which reads
+        # only these columns (index-only scans)
+        Index(
+            'ix_farmer_bill_items_bill_hsn', 'farmer_bill_id', 'hsn_code',
+            postgresql_include=['quantity_bags', 'weight', 'item_total']
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     farmer_bill_id = Column(UUID(as_uuid=True), ForeignKey('farmer_bills.id', ondelete='CASCADE'), nullable=False)
@@ -138,6 +169,14 @@ class FarmerBillItem(db.Model):
 
 class DealerBillItem(db.Model):
     __tablename__ = 'dealer_bill_items'
+    __table_args__ = (
+        # Bill -> items lookups; also covers the HSN summary, which reads
+        # only these columns (index-only scans)
+        Index(
+            'ix_dealer_bill_items_bill_hsn', 'dealer_bill_id', 'hsn_code',
+            postgresql_include=['quantity_bags', 'weight', 'item_total']
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     dealer_bill_id = Column(UUID(as_uuid=True), ForeignKey('dealer_bills.id', ondelete='CASCADE'), nullable=False)
@@ -188,6 +227,17 @@ class Dealer(db.Model):
 
 class Deal(db.Model):
     __tablename__ = 'deals'
+    __table_args__ = (
+        # Trigram indexes for substring/fuzzy search (requires pg_trgm)
+        Index('ix_deals_customer_name_trgm', 'customer_name',
+              postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}),
+        Index('ix_deals_deal_number_trgm', 'deal_number',
+              postgresql_using='gin', postgresql_ops={'deal_number': 'gin_trgm_ops'}),
+        Index('ix_deals_deal_date', 'deal_date'),
+        # List/dashboard sorting and filtering on the denormalized balances
+        Index('ix_deals_status_outstanding_principal', 'status', 'outstanding_principal'),
+        Index('ix_deals_status_next_due_date', 'status', 'next_due_date'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     deal_number = Column(String, unique=True, nullable=False)
@@ -198,11 +248,23 @@ class Deal(db.Model):
     status = Column(String, default='active')  # 'active', 'closed'
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # Denormalized balances, maintained by app.utils.deal_balances
+    outstanding_principal = Column(Numeric(12, 2), nullable=False, default=0)  # pending on 'installment' rows
+    paid_to_date = Column(Numeric(12, 2), nullable=False, default=0)  # sum of payments
+    accrued_interest = Column(Numeric(12, 2), nullable=False, default=0)  # pending on the 'interest' row
+    next_due_date = Column(Date)  # earliest unpaid 'installment' row
+    
     installments = relationship('Installment', backref='deal', cascade='all, delete-orphan', lazy=True, order_by='Installment.due_date')
     payments = relationship('Payment', backref='deal', cascade='all, delete-orphan', lazy=True, order_by='Payment.payment_date')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, accrued_interest=None, as_of=None, include_items=True):
+        """
+        Serialize the deal. When ``accrued_interest`` is given, the stored
+        interest installment is replaced by that amount as of ``as_of``
+        (computed at read time, nothing is written). ``include_items=False``
+        leaves out the installments and payments.
+        """
+        data = {
             'id': str(self.id),
             'deal_number': self.deal_number,
             'customer_name': self.customer_name,
@@ -211,12 +273,47 @@ class Deal(db.Model):
             'deal_date': self.deal_date.isoformat() if self.deal_date else None,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'installments': [inst.to_dict() for inst in self.installments],
-            'payments': [payment.to_dict() for payment in self.payments]
+            'outstanding_principal': float(self.outstanding_principal) if self.outstanding_principal else 0,
+            'paid_to_date': float(self.paid_to_date) if self.paid_to_date else 0,
+            'accrued_interest': float(self.accrued_interest) if self.accrued_interest else 0,
+            'next_due_date': self.next_due_date.isoformat() if self.next_due_date else None
         }
+        if include_items:
+            data['installments'] = [inst.to_dict() for inst in self.installments]
+            data['payments'] = [payment.to_dict() for payment in self.payments]
+        
+        if accrued_interest is not None:
+            # Same 2-decimal rounding the Numeric column applies when stored
+            accrued_interest = Decimal(str(accrued_interest)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            data['accrued_interest'] = float(accrued_interest)
+            
+            if include_items:
+                as_of = as_of or date.today()
+                interest = {
+                    'due_date': as_of.isoformat(),
+                    'amount': float(accrued_interest),
+                    'pending_amount': float(accrued_interest),
+                    'status': 'unpaid' if accrued_interest > 0 else 'paid'
+                }
+                stored = next((inst for inst in data['installments'] if inst['type'] == 'interest'), None)
+                if stored:
+                    stored.update(interest)
+                elif accrued_interest > 0:
+                    data['installments'].append({
+                        'id': None, 'deal_id': str(self.id), 'type': 'interest',
+                        'sequence_number': 9999, 'created_at': None, **interest
+                    })
+        return data
 
 class Installment(db.Model):
     __tablename__ = 'installments'
+    __table_args__ = (
+        # At most one accrued-interest row per deal; target of the accrual upsert
+        Index('ux_installments_deal_interest', 'deal_id', unique=True,
+              postgresql_where=text("type = 'interest'")),
+        # Deal ledger pages, read in (due_date, id) order
+        Index('ix_installments_deal_due_date_id', 'deal_id', 'due_date', 'id'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     deal_id = Column(UUID(as_uuid=True), ForeignKey('deals.id', ondelete='CASCADE'), nullable=False)
@@ -245,6 +342,13 @@ class Installment(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        # A client-supplied key identifies one payment per deal across retries
+        Index('ux_payments_deal_idempotency_key', 'deal_id', 'idempotency_key', unique=True,
+              postgresql_where=text('idempotency_key IS NOT NULL')),
+        # Deal ledger pages, read in (payment_date, id) order
+        Index('ix_payments_deal_payment_date_id', 'deal_id', 'payment_date', 'id'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     deal_id = Column(UUID(as_uuid=True), ForeignKey('deals.id', ondelete='CASCADE'), nullable=False)
@@ -252,6 +356,7 @@ class Payment(db.Model):
     amount = Column(Numeric(10, 2), nullable=False)
     type = Column(String, default='installment')  # 'installment', 'interest', 'principal'
     remark = Column(Text)
+    idempotency_key = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     allocations = relationship('PaymentAllocation', backref='payment', cascade='all, delete-orphan', lazy=True)
@@ -306,3 +411,82 @@ class Item(db.Model):
             'price': float(self.price) if self.price else 0,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+# ============ REPORT AGGREGATES ============
+
+class BillDailySummary(db.Model):
+    """Per-day bill totals, kept up to date as bills are created"""
+    __tablename__ = 'bill_daily_summaries'
+    
+    kind = Column(String, primary_key=True)  # 'farmer', 'dealer'
+    date = Column(Date, primary_key=True)
+    bill_count = Column(Integer, nullable=False, default=0)
+    taxable_value = Column(Numeric(14, 2), nullable=False, default=0)
+    gst_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    cgst = Column(Numeric(14, 2), nullable=False, default=0)
+    sgst = Column(Numeric(14, 2), nullable=False, default=0)
+    grand_total = Column(Numeric(14, 2), nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'date': self.date.isoformat() if self.date else None,
+            'bill_count': self.bill_count or 0,
+            'taxable_value': float(self.taxable_value) if self.taxable_value else 0,
+            'gst_amount': float(self.gst_amount) if self.gst_amount else 0,
+            'cgst': float(self.cgst) if self.cgst else 0,
+            'sgst': float(self.sgst) if self.sgst else 0,
+            'grand_total': float(self.grand_total) if self.grand_total else 0
+        }
+
+class ReportDataVersion(db.Model):
+    """
+    Change counter per kind and month ('YYYY-MM'), bumped whenever bills in
+    that month are written. Period '*' is bumped for writes whose month is
+    not known (e.g. bulk UPDATE by primary key).
+    """
+    __tablename__ = 'report_data_versions'
+    
+    kind = Column(String, primary_key=True)  # 'farmer', 'dealer'
+    period = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# ============ BACKGROUND JOBS ============
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        # Workers poll for the oldest queued job
+        Index('ix_report_jobs_status_created_at', 'status', 'created_at'),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_type = Column(String, nullable=False)
+    params = Column(JSONB, nullable=False, default=dict)
+    status = Column(String, nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    error = Column(Text)
+    result_path = Column(String)
+    result_filename = Column(String)
+    result_mimetype = Column(String)
+    worker = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # last sign of life from the running worker
+    finished_at = Column(DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'job_type': self.job_type,
+            'params': self.params or {},
+            'status': self.status,
+            'progress': self.progress or 0,
+            'error': self.error,
+            'result_filename': self.result_filename,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,301 @@
+from flask import current_app
+from app import db
+from app.models import (
+    FarmerBill, DealerBill, FarmerBillItem, DealerBillItem, ReportDataVersion
+)
+from app.reports.exports import build_report_file
+from app.utils.pdf_cache import PdfCache
+from app.utils.periods import period_bounds
+from datetime import datetime
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# Bump when the layout of any report file changes
+REPORT_LAYOUT_VERSION = 1
+
+# Period bumped for writes whose month is not known
+ALL_PERIODS = '*'
+
+# Report data kind for every table whose rows end up in a report
+_BILL_MODELS = {FarmerBill: 'farmer', DealerBill: 'dealer'}
+_ITEM_MODELS = {
+    FarmerBillItem: ('farmer', FarmerBill, 'farmer_bill_id'),
+    DealerBillItem: ('dealer', DealerBill, 'dealer_bill_id'),
+}
+_TABLE_KINDS = {
+    FarmerBill.__tablename__: 'farmer', FarmerBillItem.__tablename__: 'farmer',
+    DealerBill.__tablename__: 'dealer', DealerBillItem.__tablename__: 'dealer',
+}
+_ITEM_TABLES = {
+    FarmerBillItem.__tablename__: (FarmerBill, 'farmer_bill_id'),
+    DealerBillItem.__tablename__: (DealerBill, 'dealer_bill_id'),
+}
+
+# session.info key holding the (kind, period) pairs written so far
+_PENDING = 'report_periods'
+
+# session.info key mapping ids of bills inserted in this transaction to
+# their period, so bulk item inserts can be attributed without a query
+_BILL_PERIODS = 'report_bill_periods'
+
+
+def _period(value):
+    return value.strftime('%Y-%m') if value else ALL_PERIODS
+
+
+def _periods_between(start, end):
+    """'YYYY-MM' for each month in the half-open range [start, end)"""
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) < (end.year, end.month):
+        periods.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+# ============ WRITE TRACKING ============
+#
+# Bills and items written through the ORM are picked up in before_flush,
+# bulk INSERT/UPDATE/DELETE statements in do_orm_execute. Bulk item inserts
+# take their periods from the bills inserted earlier in the transaction (or
+# one lookup of their bills' dates); only bulk UPDATE/DELETE statements,
+# whose rows are not known, bump the all-periods version. The collected
+# periods are bumped in before_commit, inside the committing transaction,
+# so a rolled back write never invalidates anything and a committed one
+# always does.
+
+@event.listens_for(Session, 'before_flush')
+def _collect_flushed_periods(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING, set())
+    with session.no_autoflush:
+        for obj in [*session.new, *session.dirty, *session.deleted]:
+            model = type(obj)
+            if model in _BILL_MODELS:
+                kind = _BILL_MODELS[model]
+                pending.add((kind, _period(obj.date)))
+                # A bill moved to another month changes the old month too
+                for old_date in inspect(obj).attrs.date.history.deleted:
+                    pending.add((kind, _period(old_date)))
+            elif model in _ITEM_MODELS:
+                kind, bill_model, fk_name = _ITEM_MODELS[model]
+                bill_id = getattr(obj, fk_name)
+                bill = session.get(bill_model, bill_id) if bill_id else None
+                pending.add((kind, _period(bill.date if bill else None)))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_periods(orm_execute_state):
+    state = orm_execute_state
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    kind = _TABLE_KINDS.get(getattr(state.statement.table, 'name', None))
+    if kind is None:
+        return
+
+    session = state.session
+    pending = session.info.setdefault(_PENDING, set())
+    rows = state.parameters
+    if isinstance(rows, dict):
+        rows = [rows]
+
+    table_name = state.statement.table.name
+    if state.is_insert and rows and table_name in _ITEM_TABLES:
+        periods = _item_periods(session, table_name, rows)
+        if periods is not None:
+            pending.update((kind, period) for period in periods)
+            return
+    elif state.is_insert and rows and all(row.get('date') for row in rows):
+        pending.update((kind, _period(row['date'])) for row in rows)
+        session.info.setdefault(_BILL_PERIODS, {}).update(
+            (row['id'], _period(row['date'])) for row in rows if row.get('id')
+        )
+        return
+    pending.add((kind, ALL_PERIODS))
+
+
+def _item_periods(session, table_name, rows):
+    """Periods of the bills that inserted item ``rows`` belong to, or None if unknown"""
+    bill_model, fk_name = _ITEM_TABLES[table_name]
+    bill_ids = {row.get(fk_name) for row in rows}
+    if None in bill_ids:
+        return None
+
+    known = session.info.get(_BILL_PERIODS, {})
+    periods = {known[bill_id] for bill_id in bill_ids if bill_id in known}
+    missing = [bill_id for bill_id in bill_ids if bill_id not in known]
+    if missing:
+        dates = session.execute(
+            select(bill_model.id, bill_model.date).where(bill_model.id.in_(missing))
+        ).all()
+        if len(dates) != len(missing):
+            return None
+        periods.update(_period(bill_date) for _, bill_date in dates)
+    return periods
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_report_versions(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    session.info.pop(_BILL_PERIODS, None)
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+
+    now = datetime.utcnow()
+    stmt = insert(ReportDataVersion).values([
+        {'kind': kind, 'period': period, 'version': 1, 'updated_at': now}
+        for kind, period in sorted(pending)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['kind', 'period'],
+        set_={
+            'version': ReportDataVersion.__table__.c.version + 1,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    session.execute(stmt)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_periods(session):
+    session.info.pop(_PENDING, None)
+    session.info.pop(_BILL_PERIODS, None)
+
+
+def report_data_versions(kind, month=None, year=None):
+    """
+    Data versions covering a report period.
+
+    Returns:
+        Sorted list of (period, version); it changes whenever a bill in the
+        period (or a bill of unknown period) is written
+    """
+    query = select(ReportDataVersion.period, ReportDataVersion.version).where(
+        ReportDataVersion.kind == kind
+    )
+    bounds = period_bounds(month, year)
+    if bounds:
+        query = query.where(ReportDataVersion.period.in_([ALL_PERIODS, *_periods_between(*bounds)]))
+    return sorted(tuple(row) for row in db.session.execute(query))
+
+
+# ============ ARTIFACT CACHE ============
+
+class ReportCache(PdfCache):
+    """
+    Disk-backed LRU cache of finished report files.
+
+    Keys include the data versions of the report's period, so any write to a
+    bill in that period produces a new key; entries are never invalidated
+    in place and simply age out.
+    """
+
+    suffix = '.report'
+
+    @staticmethod
+    def make_report_key(report_kind, fmt, month, year, versions):
+        payload = json.dumps(
+            [REPORT_LAYOUT_VERSION, report_kind, fmt, str(month or ''), str(year or ''), versions],
+            default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def open(self, key):
+        """Cached report as an open binary file, or None on a miss"""
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return f
+
+    def put_file(self, key, fileobj):
+        """Copy ``fileobj`` into the cache and rewind it for the caller"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(fileobj, f)
+                size = f.tell()
+            if size > self.max_bytes:
+                os.remove(tmp_path)
+            else:
+                self._replace(tmp_path, key, size)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            fileobj.seek(0)
+
+
+class _NullReportCache:
+    """Stand-in used when caching is disabled (REPORT_CACHE_MAX_BYTES = 0)"""
+
+    make_report_key = staticmethod(ReportCache.make_report_key)
+
+    def open(self, key):
+        return None
+
+    def put_file(self, key, fileobj):
+        pass
+
+    def stats(self):
+        return {'enabled': False}
+
+
+# Guards first-use creation so concurrent request threads share one cache
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    """Return the report cache for the current app, creating it on first use"""
+    cache = current_app.extensions.get('report_cache')
+    if cache is None:
+        with _report_cache_lock:
+            cache = current_app.extensions.get('report_cache')
+            if cache is None:
+                max_bytes = current_app.config.get('REPORT_CACHE_MAX_BYTES', 0)
+                if max_bytes > 0:
+                    cache = ReportCache(current_app.config['REPORT_CACHE_DIR'], max_bytes)
+                else:
+                    cache = _NullReportCache()
+                current_app.extensions['report_cache'] = cache
+    return cache
+
+
+def cached_report_file(kind, fmt, month=None, year=None, progress=None):
+    """
+    ``build_report_file`` behind the report cache.
+
+    Data versions are read before the report, so a write that commits while
+    the report is being built leaves it under a key no later request uses.
+
+    Returns:
+        File object positioned at the start of the report
+    """
+    cache = get_report_cache()
+    versions = report_data_versions(kind.split('_')[0], month, year)
+    key = cache.make_report_key(kind, fmt, month, year, versions)
+
+    cached = cache.open(key)
+    if cached is not None:
+        if progress:
+            progress(1, 1)
+        return cached
+
+    output = build_report_file(kind, fmt, month, year, progress=progress)
+    cache.put_file(key, output)
+    return output
@@ -0,0 +1,334 @@
+from app import db
+from app.models import FarmerBill, DealerBill, FarmerBillItem, DealerBillItem
+from app.utils.periods import filter_by_period
+from openpyxl import Workbook
+from sqlalchemy import func, literal, select
+from functools import partial
+import csv
+import io
+import json
+import tempfile
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+EXPORT_MIMETYPES = {
+    'xlsx': XLSX_MIMETYPE,
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 2000
+
+# Report progress every N rows
+PROGRESS_EVERY = 5000
+
+# Spool finished workbooks/parquet files in memory up to this size, then on disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Rows per chunk sent for CSV/NDJSON responses
+TEXT_CHUNK_ROWS = 500
+
+# Rows per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 50000
+
+FARMER_COLUMNS = [
+    'Bill ID', 'Date', 'Customer Name', 'Item', 'Weight', 'Price', 'Item Total',
+    'Other Expense', 'Discount', 'Final Total'
+]
+
+DEALER_COLUMNS = [
+    'Bill ID', 'Date', 'Customer Name', 'Item', 'Weight', 'Price', 'Item Total',
+    'Other Expense', 'Discount', 'GST %', 'GST Amount', 'CGST', 'SGST', 'Grand Total'
+]
+
+# Machine-friendly names for the same columns, used by NDJSON and Parquet
+FARMER_FIELDS = [
+    'bill_id', 'date', 'customer_name', 'item', 'weight', 'price', 'item_total',
+    'other_expense', 'discount', 'final_total'
+]
+
+DEALER_FIELDS = [
+    'bill_id', 'date', 'customer_name', 'item', 'weight', 'price', 'item_total',
+    'other_expense', 'discount', 'gst_percentage', 'gst_amount', 'cgst', 'sgst', 'grand_total'
+]
+
+# Leading text columns in both layouts; the rest are amounts
+TEXT_FIELD_COUNT = 4
+
+HSN_COLUMNS = [
+    'HSN Code', 'GST %', 'Lines', 'Bags', 'Weight', 'Taxable Value', 'CGST', 'SGST', 'Total Tax'
+]
+
+HSN_FIELDS = [
+    'hsn_code', 'gst_percentage', 'lines', 'quantity_bags', 'weight', 'taxable_value',
+    'cgst', 'sgst', 'total_tax'
+]
+
+
+def report_filename(kind, month=None, year=None, fmt='xlsx'):
+    name = f'{kind}_summary' if kind.endswith('_hsn') else f'{kind}_bills'
+    return f'{name}_{month or "all"}_{year or "all"}.{fmt}'
+
+
+def _float(value):
+    return float(value) if value is not None else 0.0
+
+
+def _farmer_rows_query(month=None, year=None):
+    query = select(
+        FarmerBill.bill_id, FarmerBill.date, FarmerBill.customer_name,
+        FarmerBillItem.item, FarmerBillItem.weight, FarmerBillItem.price, FarmerBillItem.item_total,
+        FarmerBill.other_expense, FarmerBill.discount, FarmerBill.final_total
+    ).join(FarmerBillItem, FarmerBillItem.farmer_bill_id == FarmerBill.id)
+    return filter_by_period(query, FarmerBill.date, month, year)
+
+
+def _dealer_rows_query(month=None, year=None):
+    query = select(
+        DealerBill.bill_id, DealerBill.date, DealerBill.customer_name,
+        DealerBillItem.item, DealerBillItem.weight, DealerBillItem.price, DealerBillItem.item_total,
+        DealerBill.other_expense, DealerBill.discount, DealerBill.gst_percentage,
+        DealerBill.gst_amount, DealerBill.cgst, DealerBill.sgst, DealerBill.grand_total
+    ).join(DealerBillItem, DealerBillItem.dealer_bill_id == DealerBill.id)
+    return filter_by_period(query, DealerBill.date, month, year)
+
+
+def _stream_rows(query, order_by, progress=None):
+    """
+    Yield report rows (one per bill item) from a server-side cursor.
+
+    Rows are fetched ``EXPORT_BATCH_SIZE`` at a time, so memory does not
+    grow with the size of the period being exported.
+    """
+    total = None
+    if progress:
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+    result = db.session.execute(
+        query.order_by(*order_by),
+        execution_options={'yield_per': EXPORT_BATCH_SIZE}
+    )
+    done = 0
+    for row in result:
+        yield row
+        done += 1
+        if progress and done % PROGRESS_EVERY == 0:
+            progress(done, total)
+    if progress:
+        progress(done, total)
+
+
+def iter_farmer_rows(month=None, year=None, progress=None):
+    """Farmer report rows as plain value lists in FARMER_COLUMNS order"""
+    query = _farmer_rows_query(month, year)
+    for row in _stream_rows(query, [FarmerBill.date.desc(), FarmerBill.id], progress):
+        yield [
+            row.bill_id, row.date.strftime('%Y-%m-%d'), row.customer_name, row.item,
+            _float(row.weight), _float(row.price), _float(row.item_total),
+            _float(row.other_expense), _float(row.discount), _float(row.final_total)
+        ]
+
+
+def iter_dealer_rows(month=None, year=None, progress=None):
+    """Dealer report rows as plain value lists in DEALER_COLUMNS order"""
+    query = _dealer_rows_query(month, year)
+    for row in _stream_rows(query, [DealerBill.date.desc(), DealerBill.id], progress):
+        yield [
+            row.bill_id, row.date.strftime('%Y-%m-%d'), row.customer_name, row.item,
+            _float(row.weight), _float(row.price), _float(row.item_total),
+            _float(row.other_expense), _float(row.discount), _float(row.gst_percentage),
+            _float(row.gst_amount), _float(row.cgst), _float(row.sgst), _float(row.grand_total)
+        ]
+
+
+def hsn_summary_query(kind, month=None, year=None):
+    """
+    One row per (HSN code, GST rate) for a period, aggregated in the database.
+
+    Taxable value is the sum of item totals; bill-level other expenses and
+    discounts are not apportioned to items. CGST and SGST are each rounded
+    once per group, the same half-rate rule used for bill totals.
+    """
+    if kind == 'farmer':
+        bill, item, item_fk = FarmerBill, FarmerBillItem, FarmerBillItem.farmer_bill_id
+        rate = literal(0)
+    else:
+        bill, item, item_fk = DealerBill, DealerBillItem, DealerBillItem.dealer_bill_id
+        rate = func.coalesce(DealerBill.gst_percentage, 0)
+
+    half_tax = func.round(func.sum(item.item_total * rate) / 200, 2)
+    query = select(
+        item.hsn_code.label('hsn_code'),
+        rate.label('gst_percentage'),
+        func.count().label('lines'),
+        func.coalesce(func.sum(item.quantity_bags), 0).label('quantity_bags'),
+        func.sum(item.weight).label('weight'),
+        func.sum(item.item_total).label('taxable_value'),
+        half_tax.label('cgst'),
+        half_tax.label('sgst'),
+        (half_tax * 2).label('total_tax')
+    ).join(bill, item_fk == bill.id)
+    query = filter_by_period(query, bill.date, month, year)
+    return query.group_by(item.hsn_code, rate).order_by(item.hsn_code, rate)
+
+
+def iter_hsn_rows(kind, month=None, year=None, progress=None):
+    """HSN summary rows as plain value lists in HSN_COLUMNS order"""
+    rows = db.session.execute(hsn_summary_query(kind, month, year)).all()
+    for row in rows:
+        yield [
+            row.hsn_code or '', _float(row.gst_percentage), row.lines, int(row.quantity_bags or 0),
+            _float(row.weight), _float(row.taxable_value),
+            _float(row.cgst), _float(row.sgst), _float(row.total_tax)
+        ]
+    if progress:
+        progress(len(rows), len(rows))
+
+
+def write_xlsx(sheet_name, columns, rows):
+    """
+    Write rows to a workbook using openpyxl's write-only mode.
+
+    Write-only worksheets stream rows to a temporary file instead of keeping
+    cell objects in memory, and the finished workbook is spooled to disk once
+    it outgrows ``SPOOL_MAX_BYTES``.
+
+    Returns:
+        File object positioned at the start of the workbook
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    ws.append(columns)
+
+    empty = True
+    for row in rows:
+        ws.append(row)
+        empty = False
+    if empty:
+        ws.append(['No data found for the selected period'])
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def iter_csv(columns, rows):
+    """Yield CSV text in chunks of ``TEXT_CHUNK_ROWS`` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % TEXT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(fields, rows):
+    """Yield newline-delimited JSON objects in chunks of ``TEXT_CHUNK_ROWS`` rows"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(fields, row)), separators=(',', ':')))
+        if len(lines) == TEXT_CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def write_parquet(fields, rows, text_fields=TEXT_FIELD_COUNT):
+    """
+    Write rows to a Parquet file one row group at a time.
+
+    Only ``PARQUET_ROW_GROUP_SIZE`` rows are held in memory, column by
+    column, before each group is flushed. The first ``text_fields`` columns
+    are strings, the rest doubles.
+
+    Returns:
+        File object positioned at the start of the Parquet file
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export requires the pyarrow package')
+
+    schema = pa.schema(
+        [(f, pa.string()) for f in fields[:text_fields]] +
+        [(f, pa.float64()) for f in fields[text_fields:]]
+    )
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+    def flush(columns, writer):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        ))
+
+    with pq.ParquetWriter(output, schema, compression='snappy') as writer:
+        columns = [[] for _ in fields]
+        pending = 0
+        for row in rows:
+            for values, value in zip(columns, row):
+                values.append(value)
+            pending += 1
+            if pending == PARQUET_ROW_GROUP_SIZE:
+                flush(columns, writer)
+                columns = [[] for _ in fields]
+                pending = 0
+        if pending:
+            flush(columns, writer)
+
+    output.seek(0)
+    return output
+
+
+REPORT_KINDS = {
+    'farmer': {'sheet': 'Farmer Bills', 'columns': FARMER_COLUMNS, 'fields': FARMER_FIELDS, 'rows': iter_farmer_rows},
+    'dealer': {'sheet': 'Dealer Bills', 'columns': DEALER_COLUMNS, 'fields': DEALER_FIELDS, 'rows': iter_dealer_rows},
+    'farmer_hsn': {
+        'sheet': 'Farmer HSN Summary', 'columns': HSN_COLUMNS, 'fields': HSN_FIELDS,
+        'rows': partial(iter_hsn_rows, 'farmer'), 'text_fields': 1
+    },
+    'dealer_hsn': {
+        'sheet': 'Dealer HSN Summary', 'columns': HSN_COLUMNS, 'fields': HSN_FIELDS,
+        'rows': partial(iter_hsn_rows, 'dealer'), 'text_fields': 1
+    },
+}
+
+
+def build_report_file(kind, fmt, month=None, year=None, progress=None):
+    """
+    Build a whole report as a file in any export format.
+
+    CSV and NDJSON are streamed straight into the spooled file; callers that
+    can stream to the client should use ``iter_csv``/``iter_ndjson`` instead.
+
+    Returns:
+        File object positioned at the start of the report
+    """
+    spec = REPORT_KINDS[kind]
+    rows = spec['rows'](month, year, progress)
+
+    if fmt == 'xlsx':
+        return write_xlsx(spec['sheet'], spec['columns'], rows)
+    if fmt == 'parquet':
+        return write_parquet(spec['fields'], rows, spec.get('text_fields', TEXT_FIELD_COUNT))
+
+    if fmt == 'csv':
+        chunks = iter_csv(spec['columns'], rows)
+    elif fmt == 'ndjson':
+        chunks = iter_ndjson(spec['fields'], rows)
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    for chunk in chunks:
+        output.write(chunk.encode('utf-8'))
+    output.seek(0)
+    return output
@@ -1,123 +1,114 @@
-from flask import Blueprint, request, send_file
-from app import db
-from app.models import FarmerBill, DealerBill
-from datetime import datetime
-import pandas as pd
-from io import BytesIO
+from flask import Blueprint, Response, request, send_file, stream_with_context
+from app.reports.exports import (
+    REPORT_KINDS, EXPORT_MIMETYPES, HSN_FIELDS,
+    iter_csv, iter_ndjson, iter_hsn_rows, report_filename
+)
+from app.reports.cache import cached_report_file, get_report_cache
+from app.utils.bill_summary import get_bill_summary
 
 bp = Blueprint('reports', __name__)
 
-@bp.route('/farmer/excel', methods=['GET'])
-def export_farmer_excel():
-    """Export farmer bills to Excel"""
+BILL_KINDS = ('farmer', 'dealer')
+
+
+def _export_response(kind):
+    """
+    Shared handler for the bill report endpoints.
+
+    ``format`` selects xlsx (default), csv, ndjson or parquet. CSV and
+    NDJSON are streamed to the client row by row as they are read; xlsx and
+    parquet files are served from the report cache when the period's data
+    has not changed.
+    """
     try:
         month = request.args.get('month')
         year = request.args.get('year')
-        
-        query = FarmerBill.query
-        
-        if month and year:
-            query = query.filter(
-                db.extract('month', FarmerBill.date) == int(month),
-                db.extract('year', FarmerBill.date) == int(year)
+        fmt = request.args.get('format', 'xlsx')
+
+        if fmt not in EXPORT_MIMETYPES:
+            return {'error': f"Unsupported format: {fmt}. Expected one of: {', '.join(EXPORT_MIMETYPES)}"}, 400
+
+        filename = report_filename(kind, month, year, fmt)
+
+        if fmt in ('csv', 'ndjson'):
+            spec = REPORT_KINDS[kind]
+            rows = spec['rows'](month, year)
+            if fmt == 'csv':
+                chunks = iter_csv(spec['columns'], rows)
+            else:
+                chunks = iter_ndjson(spec['fields'], rows)
+            return Response(
+                stream_with_context(chunks),
+                mimetype=EXPORT_MIMETYPES[fmt],
+                headers={'Content-Disposition': f'attachment; filename={filename}'}
             )
-        elif year:
-            query = query.filter(db.extract('year', FarmerBill.date) == int(year))
-        
-        bills = query.order_by(FarmerBill.date.desc()).all()
-        
-        # Prepare data for Excel
-        data = []
-        for bill in bills:
-            for item in bill.items:
-                data.append({
-                    'Bill ID': bill.bill_id,
-                    'Date': bill.date.strftime('%Y-%m-%d'),
-                    'Customer Name': bill.customer_name,
-                    'Item': item.item,
-                    'Weight': float(item.weight),
-                    'Price': float(item.price),
-                    'Item Total': float(item.item_total),
-                    'Other Expense': float(bill.other_expense),
-                    'Discount': float(bill.discount),
-                    'Final Total': float(bill.final_total)
-                })
-        
-        if not data:
-            data = [{'Message': 'No data found for the selected period'}]
-        
-        df = pd.DataFrame(data)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Farmer Bills')
-        output.seek(0)
-        
-        filename = f'farmer_bills_{month or "all"}_{year or "all"}.xlsx'
+
         return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            cached_report_file(kind, fmt, month, year),
+            mimetype=EXPORT_MIMETYPES[fmt],
             as_attachment=True,
             download_name=filename
         )
     except Exception as e:
         return {'error': str(e)}, 400
 
+@bp.route('/farmer/excel', methods=['GET'])
+def export_farmer_excel():
+    """Export farmer bills to Excel (or csv/ndjson/parquet via ``format``)"""
+    return _export_response('farmer')
+
 @bp.route('/dealer/excel', methods=['GET'])
 def export_dealer_excel():
-    """Export dealer bills to Excel with GST details"""
+    """Export dealer bills to Excel with GST details (or csv/ndjson/parquet via ``format``)"""
+    return _export_response('dealer')
+
+@bp.route('/summary', methods=['GET'])
+def get_summary():
+    """
+    Monthly (or daily with ``group=day``) GST totals for ``kind`` (default
+    dealer), served from the pre-aggregated daily summary table
+    """
+    try:
+        kind = request.args.get('kind', 'dealer')
+        group = request.args.get('group', 'month')
+
+        if kind not in BILL_KINDS:
+            return {'error': f"Unsupported kind: {kind}. Expected one of: {', '.join(BILL_KINDS)}"}, 400
+        if group not in ('month', 'day'):
+            return {'error': 'group must be month or day'}, 400
+
+        return get_bill_summary(kind, request.args.get('month'), request.args.get('year'), group), 200
+    except Exception as e:
+        return {'error': str(e)}, 400
+
+@bp.route('/hsn', methods=['GET'])
+def get_hsn_summary():
+    """
+    HSN-wise quantity, taxable value and tax for ``kind`` (default dealer).
+
+    Returns JSON by default; ``format`` xlsx/csv/ndjson/parquet downloads
+    the same rows as a file.
+    """
     try:
+        kind = request.args.get('kind', 'dealer')
+        fmt = request.args.get('format', 'json')
+
+        if kind not in BILL_KINDS:
+            return {'error': f"Unsupported kind: {kind}. Expected one of: {', '.join(BILL_KINDS)}"}, 400
+        if fmt != 'json':
+            return _export_response(f'{kind}_hsn')
+
         month = request.args.get('month')
         year = request.args.get('year')
-        
-        query = DealerBill.query
-        
-        if month and year:
-            query = query.filter(
-                db.extract('month', DealerBill.date) == int(month),
-                db.extract('year', DealerBill.date) == int(year)
-            )
-        elif year:
-            query = query.filter(db.extract('year', DealerBill.date) == int(year))
-        
-        bills = query.order_by(DealerBill.date.desc()).all()
-        
-        # Prepare data for Excel
-        data = []
-        for bill in bills:
-            for item in bill.items:
-                data.append({
-                    'Bill ID': bill.bill_id,
-                    'Date': bill.date.strftime('%Y-%m-%d'),
-                    'Customer Name': bill.customer_name,
-                    'Item': item.item,
-                    'Weight': float(item.weight),
-                    'Price': float(item.price),
-                    'Item Total': float(item.item_total),
-                    'Other Expense': float(bill.other_expense),
-                    'Discount': float(bill.discount),
-                    'GST %': float(bill.gst_percentage),
-                    'GST Amount': float(bill.gst_amount),
-                    'CGST': float(bill.cgst),
-                    'SGST': float(bill.sgst),
-                    'Grand Total': float(bill.grand_total)
-                })
-        
-        if not data:
-            data = [{'Message': 'No data found for the selected period'}]
-        
-        df = pd.DataFrame(data)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Dealer Bills')
-        output.seek(0)
-        
-        filename = f'dealer_bills_{month or "all"}_{year or "all"}.xlsx'
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        rows = [dict(zip(HSN_FIELDS, row)) for row in iter_hsn_rows(kind, month, year)]
+        return {'kind': kind, 'month': month, 'year': year, 'rows': rows}, 200
     except Exception as e:
         return {'error': str(e)}, 400
 
+@bp.route('/cache/stats', methods=['GET'])
+def get_report_cache_stats():
+    """Hit/miss counters and disk usage of the report file cache"""
+    try:
+        return get_report_cache().stats(), 200
+    except Exception as e:
+        return {'error': str(e)}, 400
@@ -0,0 +1 @@
+# Search blueprint package
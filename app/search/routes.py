@@ -0,0 +1,91 @@
+from flask import Blueprint, request, jsonify
+from app import db
+from app.models import FarmerBill, DealerBill, Deal
+from app.utils.pagination import parse_limit
+from sqlalchemy import func, or_
+
+bp = Blueprint('search', __name__)
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+# scope -> (model, name column, number column, serializer)
+SEARCH_SCOPES = {
+    'farmer_bills': (FarmerBill, FarmerBill.customer_name, FarmerBill.bill_id,
+                     lambda row: row.to_dict(include_items=False)),
+    'dealer_bills': (DealerBill, DealerBill.customer_name, DealerBill.bill_id,
+                     lambda row: row.to_dict(include_items=False)),
+    'deals': (Deal, Deal.customer_name, Deal.deal_number,
+              lambda row: {
+                  'id': str(row.id),
+                  'deal_number': row.deal_number,
+                  'customer_name': row.customer_name,
+                  'deal_date': row.deal_date.isoformat() if row.deal_date else None,
+                  'status': row.status
+              }),
+}
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _ranked_search(model, name_column, number_column, term, limit):
+    """
+    Prefix and fuzzy match on name/number, best matches first.
+
+    Every predicate here (trigram ``%``, ``ILIKE 'x%'``) can be answered by
+    the gin_trgm_ops indexes, so cost depends on matches, not table size.
+    """
+    prefix = f'{_escape_like(term)}%'
+    score = func.greatest(
+        func.similarity(name_column, term),
+        func.similarity(number_column, term)
+    )
+    # Prefix hits rank above pure fuzzy hits with the same similarity
+    is_prefix = or_(name_column.ilike(prefix), number_column.ilike(prefix))
+
+    rows = db.session.query(model, score.label('score')).filter(or_(
+        name_column.op('%')(term),
+        name_column.ilike(prefix),
+        number_column.ilike(prefix)
+    )).order_by(is_prefix.desc(), score.desc()).limit(limit).all()
+
+    return rows
+
+
+@bp.route('/search', methods=['GET'])
+def search():
+    """
+    Search-as-you-type over bills and deals.
+
+    Query params:
+        q: Search term (customer name, bill id or deal number)
+        scope: Comma separated subset of farmer_bills, dealer_bills, deals
+        limit: Max results per scope
+    """
+    try:
+        term = (request.args.get('q') or '').strip()
+        if not term:
+            return jsonify({'error': 'q is required'}), 400
+
+        scopes = request.args.get('scope')
+        scopes = [s.strip() for s in scopes.split(',')] if scopes else list(SEARCH_SCOPES)
+        unknown = [s for s in scopes if s not in SEARCH_SCOPES]
+        if unknown:
+            return jsonify({'error': f"Unknown scope: {', '.join(unknown)}"}), 400
+
+        limit = parse_limit(request.args.get('limit'), DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+
+        results = {}
+        for scope in scopes:
+            model, name_column, number_column, serialize = SEARCH_SCOPES[scope]
+            rows = _ranked_search(model, name_column, number_column, term, limit)
+            results[scope] = [
+                dict(serialize(row), score=round(float(score or 0), 4))
+                for row, score in rows
+            ]
+
+        return jsonify(results), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
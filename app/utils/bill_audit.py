@@ -0,0 +1,182 @@
+from app import db
+from app.models import FarmerBill, DealerBill, FarmerBillItem, DealerBillItem
+from sqlalchemy import BigInteger, cast, func, select, update
+import numpy as np
+
+# Keep weight x price inside int64; anything larger is recomputed with
+# Python integers instead
+_INT64_SAFE_PRODUCT = 2 ** 62
+
+
+def _paise(column):
+    """Numeric(10, 2) column as integer paise, computed in the database"""
+    return cast(func.coalesce(column, 0) * 100, BigInteger)
+
+
+def _round_half_up_div(numerator, denominator):
+    """Vectorized integer division rounded half away from zero"""
+    half = denominator // 2
+    return np.sign(numerator) * ((np.abs(numerator) + half) // denominator)
+
+
+AUDIT_SPECS = {
+    'farmer': {
+        'bill': FarmerBill,
+        'item': FarmerBillItem,
+        'item_fk': FarmerBillItem.farmer_bill_id,
+        'totals': ['final_total'],
+    },
+    'dealer': {
+        'bill': DealerBill,
+        'item': DealerBillItem,
+        'item_fk': DealerBillItem.dealer_bill_id,
+        'totals': ['gst_amount', 'cgst', 'sgst', 'grand_total'],
+    },
+}
+
+
+def _expected_item_totals(weight, price):
+    if len(weight) and int(np.abs(weight).max()) * int(np.abs(price).max()) >= _INT64_SAFE_PRODUCT:
+        weight = weight.astype(object)
+        price = price.astype(object)
+    return _round_half_up_div(weight * price, 100).astype(np.int64)
+
+
+def _expected_bill_totals(kind, headers, sub_total):
+    """Recompute header totals (paise) with the rules in app.utils.calculations"""
+    taxable = sub_total + headers['other_expense'] - headers['discount']
+    if kind == 'farmer':
+        return {'final_total': taxable}
+
+    cgst = _round_half_up_div(taxable * headers['gst_percentage'], 20000)
+    gst_amount = cgst * 2
+    return {
+        'gst_amount': gst_amount,
+        'cgst': cgst,
+        'sgst': cgst,
+        'grand_total': taxable + gst_amount
+    }
+
+
+def audit_bill_totals(kind, chunk_size=5000, fix=False, tolerance=0,
+                      date_from=None, date_to=None, on_mismatch=None):
+    """
+    Recompute stored bill and item totals from items and report drift.
+
+    Bills are read in primary-key order, ``chunk_size`` at a time, and every
+    amount is pulled as integer paise so the recomputation is plain int64
+    NumPy arithmetic over the whole chunk.
+
+    Args:
+        kind: 'farmer' or 'dealer'
+        chunk_size: Bills per chunk
+        fix: Write the recomputed values back (one bulk UPDATE per chunk)
+        tolerance: Differences up to this many paise are not reported
+        date_from: Optional inclusive lower bound on bill date
+        date_to: Optional inclusive upper bound on bill date
+        on_mismatch: Optional callable(dict) invoked for every mismatch
+
+    Returns:
+        dict with counts of bills, items, mismatching bills/items and fixes
+    """
+    spec = AUDIT_SPECS[kind]
+    bill_model = spec['bill']
+    item_model = spec['item']
+    item_fk = spec['item_fk']
+    total_fields = spec['totals']
+
+    header_fields = ['other_expense', 'discount'] + total_fields
+    if kind == 'dealer':
+        header_fields.append('gst_percentage')
+
+    summary = {'bills': 0, 'items': 0, 'bill_mismatches': 0, 'item_mismatches': 0, 'fixed': 0}
+    last_id = None
+
+    while True:
+        query = select(
+            bill_model.id, bill_model.bill_id,
+            *[_paise(getattr(bill_model, f)).label(f) for f in header_fields]
+        ).order_by(bill_model.id).limit(chunk_size)
+        if last_id is not None:
+            query = query.where(bill_model.id > last_id)
+        if date_from:
+            query = query.where(bill_model.date >= date_from)
+        if date_to:
+            query = query.where(bill_model.date <= date_to)
+
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        ids = [r.id for r in rows]
+        position = {bill_id: i for i, bill_id in enumerate(ids)}
+        headers = {
+            f: np.fromiter((getattr(r, f) for r in rows), dtype=np.int64, count=len(rows))
+            for f in header_fields
+        }
+
+        items = db.session.execute(select(
+            item_model.id, item_fk.label('bill_fk'),
+            _paise(item_model.weight).label('weight'),
+            _paise(item_model.price).label('price'),
+            _paise(item_model.item_total).label('item_total')
+        ).where(item_fk.in_(ids))).all()
+
+        n_items = len(items)
+        bill_index = np.fromiter((position[r.bill_fk] for r in items), dtype=np.int64, count=n_items)
+        weight = np.fromiter((r.weight for r in items), dtype=np.int64, count=n_items)
+        price = np.fromiter((r.price for r in items), dtype=np.int64, count=n_items)
+        stored_item_total = np.fromiter((r.item_total for r in items), dtype=np.int64, count=n_items)
+
+        expected_item_total = _expected_item_totals(weight, price)
+        sub_total = np.zeros(len(rows), dtype=np.int64)
+        np.add.at(sub_total, bill_index, expected_item_total)
+        expected = _expected_bill_totals(kind, headers, sub_total)
+
+        item_fixes = []
+        for i in np.nonzero(np.abs(expected_item_total - stored_item_total) > tolerance)[0]:
+            item = items[i]
+            summary['item_mismatches'] += 1
+            if on_mismatch:
+                on_mismatch({
+                    'kind': kind, 'bill_id': rows[bill_index[i]].bill_id, 'item_id': str(item.id),
+                    'field': 'item_total',
+                    'stored': int(stored_item_total[i]) / 100, 'expected': int(expected_item_total[i]) / 100
+                })
+            item_fixes.append({'id': item.id, 'item_total': int(expected_item_total[i]) / 100})
+
+        mismatch = np.zeros(len(rows), dtype=bool)
+        for field in total_fields:
+            mismatch |= np.abs(expected[field] - headers[field]) > tolerance
+
+        bill_fixes = []
+        for i in np.nonzero(mismatch)[0]:
+            summary['bill_mismatches'] += 1
+            if on_mismatch:
+                for field in total_fields:
+                    if abs(int(expected[field][i]) - int(headers[field][i])) > tolerance:
+                        on_mismatch({
+                            'kind': kind, 'bill_id': rows[i].bill_id, 'item_id': None, 'field': field,
+                            'stored': int(headers[field][i]) / 100, 'expected': int(expected[field][i]) / 100
+                        })
+            fix_row = {'id': rows[i].id}
+            fix_row.update({f: int(expected[f][i]) / 100 for f in total_fields})
+            bill_fixes.append(fix_row)
+
+        if fix and (bill_fixes or item_fixes):
+            # ORM bulk UPDATE by primary key: one executemany per table
+            if item_fixes:
+                db.session.execute(update(item_model), item_fixes)
+            if bill_fixes:
+                db.session.execute(update(bill_model), bill_fixes)
+            db.session.commit()
+            summary['fixed'] += len(bill_fixes) + len(item_fixes)
+        else:
+            # Release the snapshot between chunks on long read-only runs
+            db.session.rollback()
+
+        summary['bills'] += len(rows)
+        summary['items'] += n_items
+
+    return summary
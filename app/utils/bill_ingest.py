@@ -0,0 +1,151 @@
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+from app.models import FarmerBill, DealerBill, FarmerBillItem, DealerBillItem
+from app.utils.calculations import calculate_farmer_bill_totals, calculate_dealer_bill_totals
+from app.utils.bill_summary import record_bill_totals
+import uuid
+
+MAX_BULK_BILLS = 1000
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _common_header(data, bill_uuid, created_at):
+    """Header columns shared by farmer and dealer bills"""
+    if not data.get('customer_name'):
+        raise ValueError('customer_name is required')
+    return {
+        'id': bill_uuid,
+        'bill_id': str(uuid.uuid4()),
+        'date': _parse_date(data['date']),
+        'customer_name': data['customer_name'],
+        'other_expense': data.get('other_expense', 0),
+        'discount': data.get('discount', 0),
+        'transport_mode': data.get('transport_mode'),
+        'vehicle_number': data.get('vehicle_number'),
+        'supply_date': datetime.strptime(data['supply_date'], '%Y-%m-%d') if data.get('supply_date') else None,
+        'place_of_supply': data.get('place_of_supply'),
+        'receiver_address': data.get('receiver_address'),
+        'receiver_state': data.get('receiver_state'),
+        'receiver_state_code': data.get('receiver_state_code'),
+        'receiver_gstin': data.get('receiver_gstin'),
+        'created_at': created_at
+    }
+
+
+def _item_rows(items_data, fk_name, bill_uuid):
+    rows = []
+    for item_data in items_data:
+        rows.append({
+            'id': uuid.uuid4(),
+            fk_name: bill_uuid,
+            'item': item_data['item'],
+            'hsn_code': item_data.get('hsn_code'),
+            'quantity_bags': item_data.get('quantity_bags', 0),
+            'weight': item_data['weight'],
+            'price': item_data['price'],
+            'item_total': item_data['item_total']
+        })
+    return rows
+
+
+def build_farmer_bill_rows(data, created_at):
+    """
+    Validate one farmer bill payload and build its insert rows.
+
+    Returns:
+        (header_row, item_rows)
+    """
+    items_data = data.get('items', [])
+    totals = calculate_farmer_bill_totals(items_data, data.get('other_expense', 0), data.get('discount', 0))
+
+    bill_uuid = uuid.uuid4()
+    header = _common_header(data, bill_uuid, created_at)
+    header['final_total'] = totals['final_total']
+    return header, _item_rows(items_data, 'farmer_bill_id', bill_uuid)
+
+
+def build_dealer_bill_rows(data, created_at):
+    """
+    Validate one dealer bill payload and build its insert rows.
+
+    Returns:
+        (header_row, item_rows)
+    """
+    items_data = data.get('items', [])
+    gst_percentage = data.get('gst_percentage', 18)
+    totals = calculate_dealer_bill_totals(
+        items_data, data.get('other_expense', 0), data.get('discount', 0), gst_percentage
+    )
+
+    bill_uuid = uuid.uuid4()
+    header = _common_header(data, bill_uuid, created_at)
+    header.update({
+        'gst_percentage': gst_percentage,
+        'gst_amount': totals['gst_amount'],
+        'cgst': totals['cgst'],
+        'sgst': totals['sgst'],
+        'grand_total': totals['grand_total']
+    })
+    return header, _item_rows(items_data, 'dealer_bill_id', bill_uuid)
+
+
+BILL_KINDS = {
+    'farmer': (FarmerBill, FarmerBillItem, build_farmer_bill_rows),
+    'dealer': (DealerBill, DealerBillItem, build_dealer_bill_rows),
+}
+
+
+def bulk_create_bills(kind, payloads):
+    """
+    Validate a batch of bill payloads and insert the valid ones.
+
+    Headers and items are written with one executemany INSERT per table,
+    which SQLAlchemy sends as multi-row VALUES statements, inside a single
+    transaction. Invalid payloads are reported and skipped.
+
+    Args:
+        kind: 'farmer' or 'dealer'
+        payloads: List of bill dicts in the same shape as the single-bill POST
+
+    Returns:
+        List of per-row results in input order
+    """
+    bill_model, item_model, build_rows = BILL_KINDS[kind]
+    created_at = datetime.utcnow()
+
+    headers = []
+    items = []
+    results = []
+    for index, data in enumerate(payloads):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Bill must be an object')
+            header, item_rows = build_rows(data, created_at)
+        except KeyError as e:
+            results.append({'index': index, 'status': 'error', 'error': f'Missing field: {e.args[0]}'})
+            continue
+        except (ValueError, TypeError, ArithmeticError) as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+            continue
+
+        headers.append(header)
+        items.extend(item_rows)
+        results.append({
+            'index': index,
+            'status': 'created',
+            'id': str(header['id']),
+            'bill_id': header['bill_id']
+        })
+
+    if headers:
+        db.session.execute(insert(bill_model), headers)
+        if items:
+            db.session.execute(insert(item_model), items)
+        record_bill_totals(kind, headers)
+    db.session.commit()
+
+    return results
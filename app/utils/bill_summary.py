@@ -0,0 +1,166 @@
+from app import db
+from app.models import FarmerBill, DealerBill, BillDailySummary
+from app.utils.periods import filter_by_period
+from decimal import Decimal
+from sqlalchemy import delete, extract, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+SUMMARY_AMOUNTS = ['taxable_value', 'gst_amount', 'cgst', 'sgst', 'grand_total']
+
+
+def _decimal(value):
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+def _bill_amounts(kind, bill):
+    """Summary amounts for one bill header (dict) of the given kind"""
+    if kind == 'farmer':
+        total = _decimal(bill['final_total'])
+        return {'taxable_value': total, 'gst_amount': 0, 'cgst': 0, 'sgst': 0, 'grand_total': total}
+
+    gst_amount = _decimal(bill['gst_amount'])
+    grand_total = _decimal(bill['grand_total'])
+    return {
+        'taxable_value': grand_total - gst_amount,
+        'gst_amount': gst_amount,
+        'cgst': _decimal(bill['cgst']),
+        'sgst': _decimal(bill['sgst']),
+        'grand_total': grand_total
+    }
+
+
+def record_bill_totals(kind, bills):
+    """
+    Add newly created bills to the daily summary.
+
+    Must run in the same transaction that inserts the bills. Amounts are
+    pre-summed per day and applied with one ``INSERT ... ON CONFLICT DO
+    UPDATE`` that adds to the existing row, so concurrent writers never
+    lose each other's increments.
+
+    Args:
+        kind: 'farmer' or 'dealer'
+        bills: Header dicts with ``date`` and the stored total columns
+    """
+    days = {}
+    for bill in bills:
+        day = days.get(bill['date'])
+        if day is None:
+            day = days[bill['date']] = {'bill_count': 0, **dict.fromkeys(SUMMARY_AMOUNTS, Decimal('0'))}
+        day['bill_count'] += 1
+        for field, amount in _bill_amounts(kind, bill).items():
+            day[field] += amount
+
+    if not days:
+        return
+
+    stmt = insert(BillDailySummary).values([
+        {'kind': kind, 'date': date, **values} for date, values in sorted(days.items())
+    ])
+    table = BillDailySummary.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['kind', 'date'],
+        set_={
+            field: table.c[field] + stmt.excluded[field]
+            for field in ['bill_count'] + SUMMARY_AMOUNTS
+        }
+    )
+    db.session.execute(stmt)
+
+
+def _summary_source(kind):
+    """SELECT producing summary rows straight from a bill table"""
+    if kind == 'farmer':
+        total = func.coalesce(func.sum(FarmerBill.final_total), 0)
+        return select(
+            literal('farmer'), FarmerBill.date, func.count(),
+            total, literal(0), literal(0), literal(0), total
+        ).group_by(FarmerBill.date), FarmerBill.date
+
+    return select(
+        literal('dealer'), DealerBill.date, func.count(),
+        func.coalesce(func.sum(DealerBill.grand_total - DealerBill.gst_amount), 0),
+        func.coalesce(func.sum(DealerBill.gst_amount), 0),
+        # Bills created before cgst was stored have it at 0; their sgst and
+        # gst_amount were always stored
+        func.coalesce(func.sum(func.coalesce(
+            func.nullif(DealerBill.cgst, 0), DealerBill.gst_amount - DealerBill.sgst
+        )), 0),
+        func.coalesce(func.sum(DealerBill.sgst), 0),
+        func.coalesce(func.sum(DealerBill.grand_total), 0)
+    ).group_by(DealerBill.date), DealerBill.date
+
+
+def rebuild_bill_summaries(kind, date_from=None, date_to=None):
+    """
+    Recompute daily summary rows from the bill tables.
+
+    Used to backfill and after bulk corrections such as ``audit-totals
+    --fix``. Runs as one DELETE plus one INSERT ... SELECT and commits.
+
+    Returns:
+        Number of summary rows written
+    """
+    source, date_column = _summary_source(kind)
+    existing = delete(BillDailySummary).where(BillDailySummary.kind == kind)
+    if date_from:
+        source = source.where(date_column >= date_from)
+        existing = existing.where(BillDailySummary.date >= date_from)
+    if date_to:
+        source = source.where(date_column <= date_to)
+        existing = existing.where(BillDailySummary.date <= date_to)
+
+    db.session.execute(existing)
+    result = db.session.execute(
+        insert(BillDailySummary).from_select(['kind', 'date', 'bill_count'] + SUMMARY_AMOUNTS, source)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def get_bill_summary(kind, month=None, year=None, group='month'):
+    """
+    Totals per month (or per day) for a period from the summary table.
+
+    Args:
+        kind: 'farmer' or 'dealer'
+        month: Optional month (1-12), needs ``year``
+        year: Optional year
+        group: 'month' or 'day'
+
+    Returns:
+        dict with ``rows`` (one per group, oldest first) and ``totals``
+    """
+    amounts = [func.coalesce(func.sum(getattr(BillDailySummary, f)), 0).label(f) for f in SUMMARY_AMOUNTS]
+    bill_count = func.coalesce(func.sum(BillDailySummary.bill_count), 0).label('bill_count')
+
+    if group == 'day':
+        keys = [BillDailySummary.date.label('date')]
+    else:
+        keys = [
+            extract('year', BillDailySummary.date).label('year'),
+            extract('month', BillDailySummary.date).label('month')
+        ]
+
+    query = select(*keys, bill_count, *amounts).where(BillDailySummary.kind == kind)
+    query = filter_by_period(query, BillDailySummary.date, month, year)
+    query = query.group_by(*keys).order_by(*keys)
+
+    rows = []
+    totals = {'bill_count': 0, **dict.fromkeys(SUMMARY_AMOUNTS, Decimal('0'))}
+    for row in db.session.execute(query):
+        if group == 'day':
+            entry = {'date': row.date.isoformat()}
+        else:
+            entry = {'year': int(row.year), 'month': int(row.month)}
+        entry['bill_count'] = int(row.bill_count)
+        totals['bill_count'] += entry['bill_count']
+        for field in SUMMARY_AMOUNTS:
+            value = _decimal(getattr(row, field))
+            entry[field] = float(value)
+            totals[field] += value
+        rows.append(entry)
+
+    for field in SUMMARY_AMOUNTS:
+        totals[field] = float(totals[field])
+    return {'kind': kind, 'month': month, 'year': year, 'group': group, 'rows': rows, 'totals': totals}
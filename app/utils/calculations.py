@@ -1,73 +1,188 @@
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+
+# All arithmetic below is done on integer paise (1/100 rupee). Rounding rules:
+#   - Inputs (weight, price, expenses, discount) are taken to 2 decimals,
+#     matching the Numeric(10, 2) columns they are stored in.
+#   - item_total = weight x price, rounded half-up to the paisa.
+#   - GST percentage is taken to 2 decimals (basis points).
+#   - CGST and SGST are each rate/2 of the taxable value, rounded half-up to
+#     the paisa; gst_amount = CGST + SGST, so the parts always add up.
+# Half-up rounding is symmetric around zero (-0.005 rounds to -0.01).
+
+
+def _div_round_half_up(numerator, denominator):
+    """Integer division rounded half away from zero"""
+    sign = -1 if (numerator < 0) != (denominator < 0) else 1
+    quotient, remainder = divmod(abs(numerator), abs(denominator))
+    if remainder * 2 >= abs(denominator):
+        quotient += 1
+    return sign * quotient
+
+
+def to_paise(value):
+    """
+    Convert a rupee amount (int, float, str or Decimal) to integer paise.
+
+    Floats that already hold a whole number of paise (the usual JSON case)
+    take a fast path; anything finer goes through Decimal so rounding stays
+    half-up rather than binary-float dependent.
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        raise TypeError('Amount must be a number')
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        scaled = value * 100
+        rounded = round(scaled)
+        if abs(scaled - rounded) < 1e-6:
+            return int(rounded)
+        value = repr(value)
+    return int((Decimal(str(value)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def paise_to_decimal(paise):
+    """Integer paise to a 2-decimal Decimal"""
+    return Decimal(paise).scaleb(-2)
+
+
+def paise_to_float(paise):
+    return paise / 100
+
+
+def multiply_paise(a, b):
+    """Product of two paise amounts (e.g. weight x price), in paise"""
+    return _div_round_half_up(a * b, 100)
+
+
+def _item_totals_paise(items):
+    """
+    weight x price for every item, in paise.
+
+    This is the per-item hot loop, so the common float/int cases of
+    ``to_paise`` and ``multiply_paise`` are inlined.
+    """
+    totals = []
+    append = totals.append
+    for item in items:
+        weight = item.get('weight', 0)
+        price = item.get('price', 0)
+
+        if type(weight) is float and -1e13 < weight < 1e13:
+            scaled = weight * 100
+            rounded = round(scaled)
+            weight = rounded if -1e-6 < scaled - rounded < 1e-6 else to_paise(weight)
+        else:
+            weight = to_paise(weight)
+        if type(price) is float and -1e13 < price < 1e13:
+            scaled = price * 100
+            rounded = round(scaled)
+            price = rounded if -1e-6 < scaled - rounded < 1e-6 else to_paise(price)
+        else:
+            price = to_paise(price)
+
+        product = weight * price
+        if product >= 0:
+            append((product + 50) // 100)
+        else:
+            append(-((50 - product) // 100))
+    return totals
+
+
+def farmer_totals_paise(items, other_expense=0, discount=0):
+    """
+    Farmer bill totals in integer paise.
+
+    Returns:
+        dict with item_totals (list), sub_total and final_total
+    """
+    item_totals = _item_totals_paise(items)
+    sub_total = sum(item_totals)
+    final_total = sub_total + to_paise(other_expense) - to_paise(discount)
+    return {
+        'item_totals': item_totals,
+        'sub_total': sub_total,
+        'final_total': final_total
+    }
+
+
+def dealer_totals_paise(items, other_expense=0, discount=0, gst_percentage=18):
+    """
+    Dealer bill totals in integer paise.
+
+    Returns:
+        dict with item_totals (list), sub_total, taxable_value, cgst, sgst,
+        gst_amount and grand_total
+    """
+    item_totals = _item_totals_paise(items)
+    sub_total = sum(item_totals)
+    taxable_value = sub_total + to_paise(other_expense) - to_paise(discount)
+
+    # Each half of the GST is rounded on its own, as printed on the invoice
+    rate_bp = to_paise(gst_percentage)
+    cgst = _div_round_half_up(taxable_value * rate_bp, 20000)
+    sgst = cgst
+    gst_amount = cgst + sgst
+
+    return {
+        'item_totals': item_totals,
+        'sub_total': sub_total,
+        'taxable_value': taxable_value,
+        'cgst': cgst,
+        'sgst': sgst,
+        'gst_amount': gst_amount,
+        'grand_total': taxable_value + gst_amount
+    }
+
 
 def calculate_farmer_bill_totals(items, other_expense=0, discount=0):
     """
     Calculate totals for farmer bill (no GST)
-    
+
     Args:
         items: List of dicts with 'weight' and 'price'
         other_expense: Additional expense amount
         discount: Discount amount
-    
+
     Returns:
         dict with item_totals and final_total
     """
-    item_totals = []
-    for item in items:
-        weight = Decimal(str(item.get('weight', 0)))
-        price = Decimal(str(item.get('price', 0)))
-        item_total = weight * price
-        item_totals.append(float(item_total))
-        item['item_total'] = float(item_total)
-    
-    sub_total = Decimal(str(sum(item_totals)))
-    other_expense = Decimal(str(other_expense))
-    discount = Decimal(str(discount))
-    final_total = sub_total + other_expense - discount
-    
+    totals = farmer_totals_paise(items, other_expense, discount)
+
+    item_totals = [p / 100 for p in totals['item_totals']]
+    for item, item_total in zip(items, item_totals):
+        item['item_total'] = item_total
+
     return {
         'item_totals': item_totals,
-        'final_total': float(final_total)
+        'final_total': paise_to_float(totals['final_total'])
     }
 
 def calculate_dealer_bill_totals(items, other_expense=0, discount=0, gst_percentage=18):
     """
     Calculate totals for dealer bill (with GST)
-    
+
     Args:
         items: List of dicts with 'weight' and 'price'
         other_expense: Additional expense amount
         discount: Discount amount
         gst_percentage: GST percentage (default 18)
-    
+
     Returns:
         dict with item_totals, sub_total, gst_amount, cgst, sgst, grand_total
     """
-    item_totals = []
-    for item in items:
-        weight = Decimal(str(item.get('weight', 0)))
-        price = Decimal(str(item.get('price', 0)))
-        item_total = weight * price
-        item_totals.append(float(item_total))
-        item['item_total'] = float(item_total)
-    
-    sub_total = Decimal(str(sum(item_totals)))
-    other_expense = Decimal(str(other_expense))
-    discount = Decimal(str(discount))
-    sub_total_after_expenses = sub_total + other_expense - discount
-    
-    gst_percentage = Decimal(str(gst_percentage))
-    gst_amount = (sub_total_after_expenses * gst_percentage) / Decimal('100')
-    cgst = gst_amount / Decimal('2')
-    sgst = gst_amount / Decimal('2')
-    grand_total = sub_total_after_expenses + gst_amount
-    
+    totals = dealer_totals_paise(items, other_expense, discount, gst_percentage)
+
+    item_totals = [p / 100 for p in totals['item_totals']]
+    for item, item_total in zip(items, item_totals):
+        item['item_total'] = item_total
+
     return {
         'item_totals': item_totals,
-        'sub_total': float(sub_total),
-        'gst_amount': float(gst_amount),
-        'cgst': float(cgst),
-        'sgst': float(sgst),
-        'grand_total': float(grand_total)
+        'sub_total': paise_to_float(totals['sub_total']),
+        'gst_amount': paise_to_float(totals['gst_amount']),
+        'cgst': paise_to_float(totals['cgst']),
+        'sgst': paise_to_float(totals['sgst']),
+        'grand_total': paise_to_float(totals['grand_total'])
     }
-
@@ -0,0 +1,151 @@
+from app import db
+from app.models import Deal, Installment, Payment
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import and_, func, select, update
+
+BALANCE_FIELDS = ['outstanding_principal', 'paid_to_date', 'accrued_interest', 'next_due_date']
+
+
+def _decimal(value):
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+# ============ INCREMENTAL MAINTENANCE ============
+#
+# Called in the same transaction as the write they mirror. None of these
+# query or commit.
+
+def add_installments_to_balance(deal, installments):
+    """Account for newly created 'installment' rows on ``deal``"""
+    added = [inst for inst in installments if inst.type == 'installment']
+    if not added:
+        return
+    deal.outstanding_principal = _decimal(deal.outstanding_principal) + sum(
+        (_decimal(inst.pending_amount) for inst in added), Decimal('0')
+    )
+    due_dates = [inst.due_date for inst in added if _decimal(inst.pending_amount) > 0]
+    if deal.next_due_date:
+        due_dates.append(deal.next_due_date)
+    deal.next_due_date = min(due_dates) if due_dates else None
+
+
+def apply_payment_to_balance(deal, payment_amount, principal_allocated, unpaid_installments):
+    """
+    Account for a posted payment on ``deal``.
+
+    Args:
+        deal: Deal being paid
+        payment_amount: Full payment amount
+        principal_allocated: Part of it allocated to 'installment' rows
+        unpaid_installments: The deal's unpaid rows as updated by the
+            allocation (used for the next due date)
+    """
+    deal.paid_to_date = _decimal(deal.paid_to_date) + _decimal(payment_amount)
+    deal.outstanding_principal = _decimal(deal.outstanding_principal) - _decimal(principal_allocated)
+    due_dates = [
+        inst.due_date for inst in unpaid_installments
+        if inst.type == 'installment' and _decimal(inst.pending_amount) > 0
+    ]
+    deal.next_due_date = min(due_dates) if due_dates else None
+
+
+def set_accrued_interest(deal, amount):
+    """Mirror the interest row's pending amount, rounded as the column stores it"""
+    deal.accrued_interest = _decimal(amount).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+
+# ============ CONSISTENCY CHECK ============
+
+def recomputed_balances_query(deal_ids):
+    """Balances for ``deal_ids`` recomputed from installments and payments"""
+    unpaid_principal = and_(
+        Installment.type == 'installment',
+        Installment.status == 'unpaid',
+        Installment.pending_amount > 0
+    )
+    installments = select(
+        Installment.deal_id,
+        func.sum(Installment.pending_amount).filter(Installment.type == 'installment').label('outstanding_principal'),
+        func.sum(Installment.pending_amount).filter(Installment.type == 'interest').label('accrued_interest'),
+        func.min(Installment.due_date).filter(unpaid_principal).label('next_due_date')
+    ).where(Installment.deal_id.in_(deal_ids)).group_by(Installment.deal_id).subquery()
+
+    payments = select(
+        Payment.deal_id,
+        func.sum(Payment.amount).label('paid_to_date')
+    ).where(Payment.deal_id.in_(deal_ids)).group_by(Payment.deal_id).subquery()
+
+    return select(
+        Deal.id,
+        func.coalesce(installments.c.outstanding_principal, 0).label('outstanding_principal'),
+        func.coalesce(payments.c.paid_to_date, 0).label('paid_to_date'),
+        func.coalesce(installments.c.accrued_interest, 0).label('accrued_interest'),
+        installments.c.next_due_date
+    ).outerjoin(installments, installments.c.deal_id == Deal.id).outerjoin(
+        payments, payments.c.deal_id == Deal.id
+    ).where(Deal.id.in_(deal_ids))
+
+
+def check_deal_balances(chunk_size=5000, fix=False, on_mismatch=None):
+    """
+    Recompute the denormalized deal balances from scratch and report drift.
+
+    Deals are read in primary-key order, ``chunk_size`` at a time, with one
+    aggregate query per chunk.
+
+    Args:
+        chunk_size: Deals per chunk
+        fix: Write the recomputed values back (one bulk UPDATE per chunk)
+        on_mismatch: Optional callable(dict) invoked for every differing field
+
+    Returns:
+        dict with counts of deals checked, mismatching deals and fixes
+    """
+    summary = {'deals': 0, 'mismatches': 0, 'fixed': 0}
+    last_id = None
+
+    while True:
+        chunk = select(
+            Deal.id, Deal.deal_number, *[getattr(Deal, f) for f in BALANCE_FIELDS]
+        ).order_by(Deal.id).limit(chunk_size)
+        if last_id is not None:
+            chunk = chunk.where(Deal.id > last_id)
+        stored = db.session.execute(chunk).all()
+        if not stored:
+            break
+        last_id = stored[-1].id
+
+        expected = {row.id: row for row in db.session.execute(
+            recomputed_balances_query([row.id for row in stored])
+        )}
+
+        fixes = []
+        for row in stored:
+            actual = expected[row.id]
+            differs = False
+            for field in BALANCE_FIELDS:
+                old, new = getattr(row, field), getattr(actual, field)
+                if field != 'next_due_date':
+                    old, new = _decimal(old), _decimal(new)
+                if old != new:
+                    differs = True
+                    if on_mismatch:
+                        on_mismatch({
+                            'deal_number': row.deal_number, 'field': field,
+                            'stored': str(old) if old is not None else '', 'expected': str(new) if new is not None else ''
+                        })
+            if differs:
+                summary['mismatches'] += 1
+                fixes.append({'id': row.id, **{f: getattr(actual, f) for f in BALANCE_FIELDS}})
+
+        if fix and fixes:
+            # ORM bulk UPDATE by primary key
+            db.session.execute(update(Deal), fixes)
+            db.session.commit()
+            summary['fixed'] += len(fixes)
+        else:
+            db.session.rollback()
+
+        summary['deals'] += len(stored)
+
+    return summary
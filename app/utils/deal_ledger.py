@@ -0,0 +1,193 @@
+from app import db
+from app.models import Installment, Payment
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import (
+    Integer, Numeric, String, Text, cast, func, literal, literal_column, null, select, tuple_, union_all
+)
+from sqlalchemy.dialects.postgresql import UUID
+import base64
+import json
+import uuid
+
+LEDGER_FIELDS = ['date', 'type', 'description', 'amount', 'pending', 'status', 'id', 'balance']
+LEDGER_COLUMNS = ['Date', 'Type', 'Description', 'Amount', 'Pending', 'Status', 'ID', 'Balance']
+
+# Rows fetched per round trip when streaming a whole ledger
+LEDGER_STREAM_BATCH = 1000
+
+# Schedule rows sort before payments made on the same day
+_INSTALLMENT_RANK = 0
+_PAYMENT_RANK = 1
+
+
+def encode_ledger_cursor(date_value, rank, row_id, balance):
+    """
+    Opaque cursor for the ledger's (date, rank, id) order.
+
+    It also carries the running balance at that row, so the next page can
+    continue from it instead of summing every earlier entry.
+    """
+    payload = json.dumps({'d': date_value.isoformat(), 'r': rank, 'id': str(row_id), 'b': str(balance)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_ledger_cursor(cursor):
+    """Decode a cursor built by ``encode_ledger_cursor`` into (date, rank, uuid, balance)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (
+            datetime.strptime(payload['d'], '%Y-%m-%d').date(),
+            int(payload['r']),
+            uuid.UUID(payload['id']),
+            Decimal(payload['b'])
+        )
+    except (ValueError, KeyError, TypeError, InvalidOperation):
+        raise ValueError('Invalid cursor')
+
+
+def _ledger_entries(deal_id, name):
+    """
+    Installments and payments of a deal as one signed-amount entry list.
+
+    Installments (including the interest row) count as amounts due,
+    payments as negative amounts.
+    """
+    installments = select(
+        Installment.due_date.label('date'),
+        # Inline constants, so each branch stays in (date, id) index order
+        literal_column(str(_INSTALLMENT_RANK), Integer).label('rank'),
+        Installment.id.label('id'),
+        Installment.sequence_number.label('sequence_number'),
+        Installment.amount.label('amount'),
+        Installment.pending_amount.label('pending'),
+        Installment.status.label('status'),
+        cast(null(), Text).label('remark')
+    ).where(Installment.deal_id == deal_id)
+
+    payments = select(
+        Payment.payment_date,
+        literal_column(str(_PAYMENT_RANK), Integer),
+        Payment.id,
+        cast(null(), Integer),
+        -Payment.amount,
+        cast(null(), Numeric(10, 2)),
+        cast(null(), String),
+        Payment.remark
+    ).where(Payment.deal_id == deal_id)
+
+    return union_all(installments, payments).subquery(name)
+
+
+def ledger_query(deal_id, date_from=None, date_to=None, cursor=None, limit=None):
+    """
+    Ledger entries of a deal in (date, rank, id) order with a running balance.
+
+    The page is selected first (``limit`` rows after ``cursor`` within the
+    date range), and the balance is a window SUM over that page plus an
+    opening balance. After a cursor the opening balance is the one the
+    cursor carries, so the cost of a page depends on its size, not on how
+    long the deal has been running; only a first page starting at
+    ``date_from`` sums the entries before it.
+
+    Args:
+        deal_id: UUID of the deal
+        date_from: Optional first date (inclusive)
+        date_to: Optional last date (inclusive)
+        cursor: Optional (date, rank, id, balance) of the last entry already read
+        limit: Optional number of entries
+
+    Returns:
+        Select producing the ledger columns plus ``balance``
+    """
+    entries = _ledger_entries(deal_id, 'ledger')
+
+    page = select(entries)
+    opening_balance = literal(0)
+    if cursor:
+        cursor_date, cursor_rank, cursor_id, cursor_balance = cursor
+        cursor_key = tuple_(literal(cursor_date), literal(cursor_rank), literal(cursor_id, UUID(as_uuid=True)))
+        page = page.where(tuple_(entries.c.date, entries.c.rank, entries.c.id) > cursor_key)
+        opening_balance = literal(cursor_balance, Numeric)
+    elif date_from:
+        earlier = _ledger_entries(deal_id, 'earlier')
+        opening_balance = select(
+            func.coalesce(func.sum(earlier.c.amount), 0)
+        ).where(earlier.c.date < date_from).scalar_subquery()
+    if date_from:
+        page = page.where(entries.c.date >= date_from)
+    if date_to:
+        page = page.where(entries.c.date <= date_to)
+    page = page.order_by(entries.c.date, entries.c.rank, entries.c.id)
+    if limit is not None:
+        page = page.limit(limit)
+    page = page.subquery('page')
+
+    order = (page.c.date, page.c.rank, page.c.id)
+    return select(
+        page,
+        (opening_balance + func.sum(page.c.amount).over(order_by=order)).label('balance')
+    ).order_by(*order)
+
+
+def ledger_entry(row):
+    """API representation of one ledger row"""
+    if row.rank == _PAYMENT_RANK:
+        return {
+            'date': row.date.isoformat(),
+            'type': 'payment',
+            'description': f"Payment - {row.remark or 'No remark'}",
+            'amount': float(row.amount),
+            'id': str(row.id),
+            'balance': float(row.balance)
+        }
+    return {
+        'date': row.date.isoformat(),
+        'type': 'installment',
+        'description': f"Installment #{row.sequence_number} - Due",
+        'amount': float(row.amount),
+        'pending': float(row.pending),
+        'status': row.status,
+        'id': str(row.id),
+        'balance': float(row.balance)
+    }
+
+
+def get_ledger_page(deal_id, date_from=None, date_to=None, cursor=None, limit=None):
+    """
+    One page of a deal's ledger.
+
+    One extra row is fetched so callers can tell whether a next page exists
+    without a separate COUNT query.
+
+    Returns:
+        (entries, next_cursor) where next_cursor is None on the last page
+    """
+    decoded = decode_ledger_cursor(cursor) if cursor else None
+    rows = db.session.execute(ledger_query(
+        deal_id, date_from, date_to, decoded, limit + 1 if limit is not None else None
+    )).all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_ledger_cursor(last.date, last.rank, last.id, last.balance)
+
+    return [ledger_entry(row) for row in rows], next_cursor
+
+
+def iter_ledger_rows(deal_id, date_from=None, date_to=None):
+    """
+    Stream a deal's ledger as lists in ``LEDGER_FIELDS`` order.
+
+    Rows come from a server-side cursor ``LEDGER_STREAM_BATCH`` at a time.
+    """
+    result = db.session.execute(
+        ledger_query(deal_id, date_from, date_to),
+        execution_options={'yield_per': LEDGER_STREAM_BATCH}
+    )
+    for row in result:
+        entry = ledger_entry(row)
+        yield [entry.get(field) for field in LEDGER_FIELDS]
@@ -1,7 +1,15 @@
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
+from types import SimpleNamespace
 from app import db
 from app.models import Deal, Installment, Payment, PaymentAllocation
+from app.utils.deal_balances import apply_payment_to_balance, set_accrued_interest
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+import uuid
+
+# Sequence number given to the per-deal interest installment row
+INTEREST_SEQUENCE_NUMBER = 9999
 
 
 def calculate_payment_interest(payment_amount, payment_date, due_date, interest_rate):
@@ -29,103 +37,293 @@ def calculate_payment_interest(payment_amount, payment_date, due_date, interest_
     return Decimal('0')
 
 
-def update_accrued_interest(deal_id):
+def compute_accrued_interest(deal, as_of=None, installments=None):
     """
-    Calculate and update accrued interest for all overdue unpaid installments.
-    This creates/updates an 'interest' type installment row.
+    Interest accrued on a deal's overdue unpaid installments as of a date.
+    
+    Pure function: reads the deal's already loaded installments (or the
+    given ``installments``) and never writes, so it is safe to call from
+    read endpoints.
+    
+    Args:
+        deal: Deal with its installments
+        as_of: Date to accrue up to (default today)
+        installments: Optional rows to use instead of ``deal.installments``
     
     Returns:
-        Total accrued interest amount
+        Total accrued interest amount (Decimal)
     """
-    today = date.today()
-    deal = Deal.query.get(deal_id)
-    
-    if not deal or deal.interest_percentage <= 0:
+    as_of = as_of or date.today()
+    if not deal.interest_percentage or deal.interest_percentage <= 0:
         return Decimal('0')
     
     rate = Decimal(str(deal.interest_percentage))
     total_accrued_interest = Decimal('0')
     
-    # Get all unpaid, overdue installments (excluding interest type)
-    overdue_installments = Installment.query.filter(
-        Installment.deal_id == deal_id,
-        Installment.status == 'unpaid',
-        Installment.type == 'installment',
-        Installment.due_date < today
-    ).all()
-    
-    for inst in overdue_installments:
-        days_overdue = (today - inst.due_date).days
-        if days_overdue > 0 and inst.pending_amount > 0:
+    for inst in (deal.installments if installments is None else installments):
+        if inst.type != 'installment' or inst.status != 'unpaid' or inst.due_date >= as_of:
+            continue
+        days_overdue = (as_of - inst.due_date).days
+        if inst.pending_amount > 0:
             interest = (Decimal(str(inst.pending_amount)) * rate * Decimal(str(days_overdue))) / (Decimal('365') * Decimal('100'))
             total_accrued_interest += interest
     
-    # Update or create interest installment
-    interest_installment = Installment.query.filter_by(
-        deal_id=deal_id,
-        type='interest'
-    ).first()
-    
-    if interest_installment:
-        interest_installment.amount = float(total_accrued_interest)
-        interest_installment.pending_amount = float(total_accrued_interest)
-        interest_installment.due_date = today
-        if total_accrued_interest > 0:
-            interest_installment.status = 'unpaid'
-        else:
-            interest_installment.status = 'paid'
-    else:
-        interest_installment = Installment(
-            deal_id=deal_id,
-            type='interest',
-            due_date=today,
-            amount=float(total_accrued_interest),
-            pending_amount=float(total_accrued_interest),
-            status='unpaid' if total_accrued_interest > 0 else 'paid',
-            sequence_number=9999  # High number to appear last
-        )
-        db.session.add(interest_installment)
+    return total_accrued_interest
+
+
+def update_accrued_interest(deal_id, as_of=None):
+    """
+    Persist accrued interest for all overdue unpaid installments.
+    This creates/updates an 'interest' type installment row.
+    
+    This is the explicit accrual operation; read endpoints use
+    compute_accrued_interest instead.
+    
+    Returns:
+        Total accrued interest amount
+    """
+    today = as_of or date.today()
+    # Deal row lock first, like payment posting
+    deal = db.session.get(Deal, deal_id, with_for_update=True, populate_existing=True)
     
+    if not deal or deal.interest_percentage <= 0:
+        return Decimal('0')
+    
+    total_accrued_interest = compute_accrued_interest(deal, today)
+    
+    _upsert_interest_installment(deal_id, total_accrued_interest, today)
+    set_accrued_interest(deal, total_accrued_interest)
     db.session.commit()
     return total_accrued_interest
 
 
-def allocate_payment_to_installments(deal_id, payment_amount, payment_date):
+def _interest_upsert(stmt):
+    """
+    Turn an INSERT of interest installment rows into an upsert on the
+    one-interest-row-per-deal unique index.
+    """
+    return stmt.on_conflict_do_update(
+        index_elements=[Installment.deal_id],
+        index_where=Installment.type == 'interest',
+        set_={
+            'amount': stmt.excluded.amount,
+            'pending_amount': stmt.excluded.pending_amount,
+            'due_date': stmt.excluded.due_date,
+            'status': stmt.excluded.status
+        }
+    )
+
+
+def _upsert_interest_installment(deal_id, amount, as_of):
+    """Create or update the deal's interest installment (no commit)"""
+    db.session.execute(_interest_upsert(insert(Installment).values(
+        id=uuid.uuid4(),
+        deal_id=deal_id,
+        type='interest',
+        due_date=as_of,
+        amount=float(amount),
+        pending_amount=float(amount),
+        status='unpaid' if amount > 0 else 'paid',
+        sequence_number=INTEREST_SEQUENCE_NUMBER,
+        created_at=datetime.utcnow()
+    )))
+
+
+def accrue_interest_batch(as_of=None, chunk_size=5000, deal_ids=None):
+    """
+    Persist accrued interest for all active deals with set-based SQL.
+    
+    Deals are processed in primary-key order, ``chunk_size`` at a time. Each
+    chunk is one SELECT of deal ids plus one INSERT ... SELECT that sums
+    pending_amount x days overdue per deal and upserts the interest rows
+    (with deals.accrued_interest updated from its RETURNING rows in the same
+    statement), committed on its own. The chunk's deal rows are locked first,
+    in deal id order, and only then their installments, the same order
+    payment posting uses, so several processes and concurrent payments can
+    run alongside without deadlocking; the upsert makes results identical.
+    
+    Args:
+        as_of: Date to accrue up to (default today)
+        chunk_size: Deals per statement
+        deal_ids: Optional list restricting the run to these deals
+    
+    Returns:
+        dict with the number of deals processed and chunks committed
+    """
+    as_of = as_of or date.today()
+    summary = {'deals': 0, 'chunks': 0}
+    last_id = None
+    
+    while True:
+        chunk = select(Deal.id).where(
+            Deal.status == 'active',
+            Deal.interest_percentage > 0
+        ).order_by(Deal.id).limit(chunk_size)
+        if last_id is not None:
+            chunk = chunk.where(Deal.id > last_id)
+        if deal_ids is not None:
+            chunk = chunk.where(Deal.id.in_(deal_ids))
+        ids = db.session.execute(chunk.with_for_update()).scalars().all()
+        if not ids:
+            db.session.rollback()
+            break
+        last_id = ids[-1]
+        
+        overdue = select(
+            Installment.deal_id,
+            func.sum(Installment.pending_amount * (literal(as_of) - Installment.due_date)).label('weighted')
+        ).where(
+            Installment.deal_id.in_(ids),
+            Installment.type == 'installment',
+            Installment.status == 'unpaid',
+            Installment.due_date < as_of,
+            Installment.pending_amount > 0
+        ).group_by(Installment.deal_id).subquery()
+        
+        interest = func.round(
+            func.coalesce(overdue.c.weighted, 0) * Deal.interest_percentage / 36500, 2
+        )
+        rows = select(
+            func.gen_random_uuid(), Deal.id, literal('interest'), literal(as_of),
+            interest, interest, case((interest > 0, 'unpaid'), else_='paid'),
+            literal(INTEREST_SEQUENCE_NUMBER), literal(datetime.utcnow())
+        ).select_from(Deal).outerjoin(overdue, overdue.c.deal_id == Deal.id).where(
+            Deal.id.in_(ids)
+        ).order_by(Deal.id)
+        
+        upserted = _interest_upsert(insert(Installment).from_select(
+            ['id', 'deal_id', 'type', 'due_date', 'amount', 'pending_amount',
+             'status', 'sequence_number', 'created_at'],
+            rows
+        )).returning(Installment.deal_id, Installment.pending_amount).cte('upserted')
+        
+        # Same statement: mirror the new interest onto deals.accrued_interest
+        db.session.execute(
+            update(Deal).where(Deal.id == upserted.c.deal_id).values(accrued_interest=upserted.c.pending_amount),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        
+        summary['deals'] += len(ids)
+        summary['chunks'] += 1
+    
+    return summary
+
+
+def _replayed_allocation(payment, payment_amount, payment_date):
+    """Allocation result of an already posted payment, for a retried request"""
+    if Decimal(str(payment.amount)) != Decimal(str(payment_amount)) or payment.payment_date != payment_date:
+        raise ValueError('Idempotency key was already used for a different payment')
+    
+    rows = db.session.execute(
+        select(
+            PaymentAllocation.installment_id,
+            PaymentAllocation.allocated_amount,
+            PaymentAllocation.interest_amount
+        ).join(Installment, Installment.id == PaymentAllocation.installment_id).where(
+            PaymentAllocation.payment_id == payment.id
+        ).order_by(Installment.due_date.asc(), Installment.id)
+    ).all()
+    allocated = sum((Decimal(str(row.allocated_amount)) for row in rows), Decimal('0'))
+    remaining_amount = Decimal(str(payment.amount)) - allocated
+    return {
+        'payment_id': str(payment.id),
+        'allocations': [
+            {
+                'installment_id': str(row.installment_id),
+                'allocated_amount': float(row.allocated_amount),
+                'interest_realized': float(row.interest_amount or 0)
+            }
+            for row in rows
+        ],
+        'total_interest_realized': float(sum(
+            (Decimal(str(row.interest_amount or 0)) for row in rows), Decimal('0')
+        )),
+        'remaining_amount': float(remaining_amount) if remaining_amount > 0 else 0,
+        'replayed': True
+    }
+
+
+def allocate_payment_to_installments(deal_id, payment_amount, payment_date, idempotency_key=None):
     """
     Allocate payment to installments sequentially (oldest first).
     Also calculates realized interest for each allocation.
     
+    Everything happens in one transaction with a fixed number of statements,
+    however many installments are touched: a locked read of the unpaid
+    installments, the payment insert, one multi-row insert of allocations,
+    one bulk update of installments, the interest row upsert and the deal
+    balance update.
+    
+    Concurrent payments on the same deal are serialized by a row lock on
+    the deal taken before anything is read; the unpaid installments are
+    locked as well (always after the deal, in due date order). With an
+    ``idempotency_key`` a payment already posted under that key is returned
+    as it was instead of being posted again.
+    
     Args:
         deal_id: UUID of the deal
         payment_amount: Total payment amount
         payment_date: Date of payment
+        idempotency_key: Optional client key identifying this payment
     
     Returns:
         dict with allocation details and total interest realized
     """
-    deal = Deal.query.get(deal_id)
+    deal = db.session.get(Deal, deal_id, with_for_update=True, populate_existing=True)
     if not deal:
         return None
     
+    if idempotency_key:
+        # Checked under the deal lock, so a concurrent retry waits for the
+        # first attempt to commit and then finds its payment
+        existing = Payment.query.filter_by(deal_id=deal.id, idempotency_key=idempotency_key).first()
+        if existing:
+            result = _replayed_allocation(existing, payment_amount, payment_date)
+            db.session.rollback()
+            return result
+    
+    result = post_payment(deal, payment_amount, payment_date, idempotency_key=idempotency_key)
+    db.session.commit()
+    return result
+
+
+def post_payment(deal, payment_amount, payment_date, idempotency_key=None):
+    """
+    Write one payment and its allocations for a deal the caller has already
+    locked (no commit).
+    
+    Args:
+        deal: Deal loaded with a row lock
+        payment_amount: Total payment amount
+        payment_date: Date of payment
+        idempotency_key: Optional client key stored on the payment
+    
+    Returns:
+        dict with allocation details and total interest realized
+    """
     remaining_amount = Decimal(str(payment_amount))
     total_interest_realized = Decimal('0')
+    principal_allocated = Decimal('0')
     allocations = []
+    allocation_rows = []
+    installment_updates = []
     
-    # Get unpaid installments ordered by due_date (oldest first)
-    unpaid_installments = Installment.query.filter(
-        Installment.deal_id == deal_id,
-        Installment.status == 'unpaid'
-    ).order_by(Installment.due_date.asc()).all()
+    # Unpaid installments, oldest first, locked until commit
+    unpaid_installments = [
+        SimpleNamespace(**row._mapping) for row in db.session.execute(
+            select(
+                Installment.id, Installment.type, Installment.status,
+                Installment.due_date, Installment.pending_amount
+            ).where(
+                Installment.deal_id == deal.id,
+                Installment.status == 'unpaid'
+            ).order_by(Installment.due_date.asc(), Installment.id).with_for_update()
+        )
+    ]
     
-    # Create payment record
-    payment = Payment(
-        deal_id=deal_id,
-        payment_date=payment_date,
-        amount=float(payment_amount),
-        type='installment'
-    )
-    db.session.add(payment)
-    db.session.flush()
+    payment_id = uuid.uuid4()
+    created_at = datetime.utcnow()
     
     # Allocate to each installment
     for inst in unpaid_installments:
@@ -149,19 +347,25 @@ def allocate_payment_to_installments(deal_id, payment_amount, payment_date):
             )
             total_interest_realized += interest_realized
         
+        if inst.type == 'installment':
+            principal_allocated += allocate_amount
+        
         # Update installment
-        inst.pending_amount = float(Decimal(str(inst.pending_amount)) - allocate_amount)
+        inst.pending_amount = Decimal(str(inst.pending_amount)) - allocate_amount
         if inst.pending_amount <= 0:
             inst.status = 'paid'
+        installment_updates.append({
+            'id': inst.id, 'pending_amount': float(inst.pending_amount), 'status': inst.status
+        })
         
-        # Create allocation record
-        allocation = PaymentAllocation(
-            payment_id=payment.id,
-            installment_id=inst.id,
-            allocated_amount=float(allocate_amount),
-            interest_amount=float(interest_realized)
-        )
-        db.session.add(allocation)
+        allocation_rows.append({
+            'id': uuid.uuid4(),
+            'payment_id': payment_id,
+            'installment_id': inst.id,
+            'allocated_amount': float(allocate_amount),
+            'interest_amount': float(interest_realized),
+            'created_at': created_at
+        })
         allocations.append({
             'installment_id': str(inst.id),
             'allocated_amount': float(allocate_amount),
@@ -171,17 +375,42 @@ def allocate_payment_to_installments(deal_id, payment_amount, payment_date):
         remaining_amount -= allocate_amount
     
     # Update payment remark with interest info
+    remark = None
     if total_interest_realized > 0:
-        payment.remark = f"Interest realized: {float(total_interest_realized):.2f}"
+        remark = f"Interest realized: {float(total_interest_realized):.2f}"
     
-    db.session.commit()
+    db.session.execute(insert(Payment).values(
+        id=payment_id,
+        deal_id=deal.id,
+        payment_date=payment_date,
+        amount=float(payment_amount),
+        type='installment',
+        remark=remark,
+        idempotency_key=idempotency_key,
+        created_at=created_at
+    ))
+    if allocation_rows:
+        db.session.execute(insert(PaymentAllocation), allocation_rows)
+    if installment_updates:
+        # ORM bulk UPDATE by primary key: one executemany
+        db.session.execute(update(Installment), installment_updates)
     
-    # Update accrued interest after payment
-    update_accrued_interest(deal_id)
+    # Re-accrue interest on what is still overdue, from the rows in hand
+    accrued = None
+    if deal.interest_percentage and deal.interest_percentage > 0:
+        today = date.today()
+        accrued = compute_accrued_interest(deal, today, installments=unpaid_installments)
+        _upsert_interest_installment(deal.id, accrued, today)
+    
+    # Deal balances go out as a single UPDATE at commit
+    apply_payment_to_balance(deal, payment_amount, principal_allocated, unpaid_installments)
+    if accrued is not None:
+        set_accrued_interest(deal, accrued)
     
     return {
-        'payment_id': str(payment.id),
+        'payment_id': str(payment_id),
         'allocations': allocations,
         'total_interest_realized': float(total_interest_realized),
-        'remaining_amount': float(remaining_amount) if remaining_amount > 0 else 0
+        'remaining_amount': float(remaining_amount) if remaining_amount > 0 else 0,
+        'replayed': False
     }
@@ -0,0 +1,189 @@
+from app import db
+from app.models import Deal, Installment
+from app.utils.calculations import to_paise
+from sqlalchemy import select
+import numpy as np
+
+# interest (paise) = amount (paise) x rate (basis points) x days / (365 x 100 x 100)
+_INTEREST_DENOMINATOR = 365 * 100 * 100
+
+# Keep amount x rate x days inside int64; larger products fall back to
+# Python integers
+_INT64_SAFE_PRODUCT = 2 ** 62
+
+
+def _round_half_up_div(numerator, denominator):
+    """Vectorized integer division rounded half away from zero"""
+    half = denominator // 2
+    return np.sign(numerator) * ((np.abs(numerator) + half) // denominator)
+
+
+def _as_days(dates):
+    """Dates (date objects or ISO strings) as int64 days since the epoch"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def late_interest_paise(amount_paise, rate_bp, due_days, pay_days):
+    """
+    Interest realized on late payments, one row per payment date.
+
+    Vectorized form of ``calculate_payment_interest``: for every payment date
+    and every amount, amount x rate x days late / 36500, rounded half-up to
+    the paisa the way the allocation's interest_amount column stores it.
+    Payments on or before the due date realize nothing.
+
+    Args:
+        amount_paise: int64 array (N) of amounts paid against each row
+            (1-D), or one array per payment date (M x N)
+        rate_bp: int64 array (N) of annual rates in basis points
+        due_days: int64 array (N) of due dates as epoch days
+        pay_days: int64 array (M) of payment dates as epoch days
+
+    Returns:
+        int64 array (M x N) of interest in paise
+    """
+    days = np.maximum(pay_days[:, None] - due_days[None, :], 0)
+    numerator = np.broadcast_to(amount_paise * rate_bp, days.shape)
+    if numerator.size and int(np.abs(numerator).max()) * int(days.max()) >= _INT64_SAFE_PRODUCT:
+        numerator = numerator.astype(object)
+        days = days.astype(object)
+    return _round_half_up_div(numerator * days, _INTEREST_DENOMINATOR).astype(np.int64)
+
+
+def allocate_oldest_first(pending_paise, amount_paise):
+    """
+    Split payment amounts over rows ordered oldest first, like
+    ``allocate_payment_to_installments``.
+
+    Args:
+        pending_paise: int64 array (N) of pending amounts in allocation order
+        amount_paise: int64 array (M) of payment amounts
+
+    Returns:
+        int64 array (M x N) of amounts allocated to each row
+    """
+    covered_before = np.cumsum(pending_paise) - pending_paise
+    remaining = amount_paise[:, None] - covered_before[None, :]
+    return np.clip(remaining, 0, pending_paise[None, :])
+
+
+def _schedule_arrays(rows):
+    """(due_days, pending_paise, rate_bp, accrues) arrays from (due_date, pending, rate, type) rows"""
+    count = len(rows)
+    due_days = _as_days([r[0] for r in rows]) if count else np.zeros(0, dtype=np.int64)
+    pending = np.fromiter((to_paise(r[1]) for r in rows), dtype=np.int64, count=count)
+    rate_bp = np.fromiter((to_paise(r[2] or 0) for r in rows), dtype=np.int64, count=count)
+    # Only regular installments realize interest; the interest row does not
+    accrues = np.fromiter((r[3] == 'installment' for r in rows), dtype=bool, count=count)
+    return due_days, pending, rate_bp, accrues
+
+
+def simulate_deal_payments(deal, payment_dates, amount=None, detail=False):
+    """
+    Interest realized if the deal were paid on each of ``payment_dates``.
+
+    Args:
+        deal: Deal with its installments
+        payment_dates: List of dates
+        amount: Payment amount; None pays off every unpaid installment
+        detail: Include per-installment allocation and interest
+
+    Returns:
+        List with one dict per payment date
+    """
+    unpaid = sorted(
+        (inst for inst in deal.installments if inst.status == 'unpaid' and inst.pending_amount > 0),
+        key=lambda inst: inst.due_date
+    )
+    due_days, pending, rate_bp, accrues = _schedule_arrays([
+        (inst.due_date, inst.pending_amount, deal.interest_percentage, inst.type) for inst in unpaid
+    ])
+    pay_days = _as_days(payment_dates)
+
+    if amount is None:
+        allocated = np.broadcast_to(pending, (len(pay_days), len(pending)))
+    else:
+        allocated = allocate_oldest_first(pending, np.full(len(pay_days), to_paise(amount), dtype=np.int64))
+    interest = late_interest_paise(allocated, rate_bp, due_days, pay_days) * accrues
+
+    results = []
+    for i, payment_date in enumerate(payment_dates):
+        result = {
+            'payment_date': payment_date.isoformat(),
+            'amount_allocated': int(allocated[i].sum()) / 100,
+            'interest_realized': int(interest[i].sum()) / 100,
+            'pending_after': int((pending - allocated[i]).sum()) / 100
+        }
+        if detail:
+            result['installments'] = [
+                {
+                    'installment_id': str(inst.id),
+                    'due_date': inst.due_date.isoformat(),
+                    'allocated_amount': int(allocated[i][j]) / 100,
+                    'interest_realized': int(interest[i][j]) / 100
+                }
+                for j, inst in enumerate(unpaid)
+            ]
+        results.append(result)
+    return results
+
+
+def simulate_portfolio_payoff(payment_dates, status='active', deal_ids=None, top=0):
+    """
+    Interest realized if every matching deal were paid off on each date.
+
+    Loads all unpaid installments of the matching deals in one query and
+    evaluates every (installment, payment date) pair with array arithmetic.
+
+    Args:
+        payment_dates: List of dates
+        status: Deal status filter (None for all)
+        deal_ids: Optional list of deal ids
+        top: Also return the ``top`` deals with the most interest per date
+
+    Returns:
+        List with one dict per payment date
+    """
+    query = select(
+        Installment.due_date, Installment.pending_amount, Deal.interest_percentage,
+        Installment.type, Installment.deal_id
+    ).join(Deal, Deal.id == Installment.deal_id).where(
+        Installment.status == 'unpaid',
+        Installment.pending_amount > 0
+    ).order_by(Installment.deal_id, Installment.due_date)
+    if status:
+        query = query.where(Deal.status == status)
+    if deal_ids is not None:
+        query = query.where(Deal.id.in_(deal_ids))
+
+    rows = db.session.execute(query).all()
+    due_days, pending, rate_bp, accrues = _schedule_arrays(rows)
+    deal_keys = []
+    deal_index = np.zeros(len(rows), dtype=np.int64)
+    for i, row in enumerate(rows):
+        # Rows arrive grouped by deal
+        if not deal_keys or deal_keys[-1] != row.deal_id:
+            deal_keys.append(row.deal_id)
+        deal_index[i] = len(deal_keys) - 1
+
+    results = []
+    for payment_date in payment_dates:
+        # One date at a time keeps memory at O(installments)
+        interest = late_interest_paise(pending, rate_bp, due_days, _as_days([payment_date]))[0] * accrues
+        result = {
+            'payment_date': payment_date.isoformat(),
+            'deals': len(deal_keys),
+            'installments': len(rows),
+            'principal_pending': int(pending[accrues].sum()) / 100,
+            'interest_realized': int(interest.sum()) / 100
+        }
+        if top:
+            per_deal = np.zeros(len(deal_keys), dtype=np.int64)
+            np.add.at(per_deal, deal_index, interest)
+            order = np.argsort(-per_deal, kind='stable')[:top]
+            result['top_deals'] = [
+                {'deal_id': str(deal_keys[i]), 'interest_realized': int(per_deal[i]) / 100}
+                for i in order if per_deal[i] > 0
+            ]
+        results.append(result)
+    return results
@@ -0,0 +1,74 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ``limit`` query parameter, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def encode_cursor(date_value, row_id):
+    """
+    Build an opaque cursor for keyset pagination over (date, id).
+
+    Args:
+        date_value: Date of the last row on the page
+        row_id: UUID of the last row on the page
+
+    Returns:
+        URL-safe base64 string
+    """
+    payload = json.dumps({'d': date_value.isoformat(), 'id': str(row_id)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor built by ``encode_cursor`` into (date, uuid)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (
+            datetime.strptime(payload['d'], '%Y-%m-%d').date(),
+            uuid.UUID(payload['id'])
+        )
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def apply_keyset_page(query, date_column, id_column, cursor, limit):
+    """
+    Restrict a query to one page ordered by (date desc, id desc).
+
+    One extra row is fetched so callers can tell whether a next page exists
+    without a separate COUNT query.
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            date_column < cursor_date,
+            and_(date_column == cursor_date, id_column < cursor_id)
+        ))
+
+    rows = query.order_by(date_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, date_column.key), getattr(last, id_column.key))
+
+    return rows, next_cursor
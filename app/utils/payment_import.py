@@ -0,0 +1,315 @@
+from app import db
+from app.models import Deal, Payment
+from app.utils.interest_calculations import post_payment
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from openpyxl import load_workbook
+from sqlalchemy import select, tuple_
+import csv
+import hashlib
+import io
+import re
+
+# Recognised header names (lower case) for each statement field
+STATEMENT_COLUMNS = {
+    'date': ('date', 'txn date', 'transaction date', 'value date', 'posting date', 'tran date'),
+    'amount': ('amount', 'credit', 'credit amount', 'deposit', 'deposit amount', 'deposits', 'cr amount'),
+    'reference': ('utr', 'utr no', 'utr number', 'reference', 'reference no', 'ref no', 'ref no./cheque no.',
+                  'chq/ref no', 'cheque/ref no', 'transaction id', 'txn id'),
+    'narration': ('narration', 'description', 'particulars', 'remarks', 'details', 'transaction remarks'),
+    'deal_number': ('deal_number', 'deal number', 'deal no'),
+}
+
+# Deal numbers as generated by create_deal, found anywhere in a narration
+DEAL_NUMBER_PATTERN = re.compile(r'DEAL-[0-9A-F]{8}', re.IGNORECASE)
+
+STATEMENT_DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d-%b-%Y', '%d %b %Y', '%d/%m/%y', '%d-%m-%y')
+
+REPORT_FIELDS = [
+    'row', 'status', 'deal_number', 'payment_date', 'amount', 'reference',
+    'payment_id', 'allocated', 'unallocated', 'interest_realized', 'error'
+]
+
+# Statement rows read before a batch is matched and posted
+IMPORT_BATCH_ROWS = 500
+
+
+# ============ READING ============
+
+def _header_map(header):
+    """Statement field -> column index for a header row"""
+    names = [str(h).strip().lower() if h is not None else '' for h in header]
+    mapping = {}
+    for field, aliases in STATEMENT_COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                mapping[field] = index
+                break
+    missing = [f for f in ('date', 'amount') if f not in mapping]
+    if missing:
+        raise ValueError(f"Statement has no {' or '.join(missing)} column")
+    if 'deal_number' not in mapping and 'narration' not in mapping and 'reference' not in mapping:
+        raise ValueError('Statement has no deal number, narration or reference column')
+    return mapping
+
+
+def _iter_sheet_rows(fileobj, filename):
+    """Raw rows (lists of cell values) of a CSV or Excel statement"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        # read-only mode streams rows instead of loading the whole sheet
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        try:
+            yield from csv.reader(text)
+        finally:
+            text.detach()
+
+
+def iter_statement_rows(fileobj, filename):
+    """
+    Stream the credit rows of a bank statement.
+
+    The header is the first row naming a date and an amount column; rows
+    before it (bank letterheads, account details) are skipped, as are blank
+    rows.
+
+    Args:
+        fileobj: Binary file object
+        filename: Original file name (``.xlsx`` is read as Excel, anything
+            else as CSV)
+
+    Yields:
+        dicts with ``row`` (1-based line number) and the raw ``date``,
+        ``amount``, ``reference``, ``narration`` and ``deal_number`` values
+    """
+    mapping = None
+    for number, values in enumerate(_iter_sheet_rows(fileobj, filename), start=1):
+        if not any(v not in (None, '') for v in values):
+            continue
+        if mapping is None:
+            try:
+                mapping = _header_map(values)
+            except ValueError:
+                continue
+            continue
+        row = {'row': number}
+        for field in STATEMENT_COLUMNS:
+            index = mapping.get(field)
+            row[field] = values[index] if index is not None and index < len(values) else None
+        yield row
+
+    if mapping is None:
+        raise ValueError('No statement header found (need date and amount columns)')
+
+
+# ============ PARSING ============
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    for fmt in STATEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognised date: {text}')
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float, Decimal)):
+        amount = Decimal(str(value))
+    else:
+        text = str(value or '').strip().upper().replace(',', '').replace('₹', '').replace('INR', '')
+        text = text.removesuffix('CR').strip()
+        if not text:
+            # Debit rows leave the credit column empty
+            raise ValueError('Not a credit')
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f'Unrecognised amount: {value}')
+    if amount <= 0:
+        raise ValueError('Not a credit')
+    return amount.quantize(Decimal('0.01'))
+
+
+def _text(value):
+    return str(value).strip() if value not in (None, '') else None
+
+
+def _deal_number(row):
+    """Deal number from the dedicated column, else from narration or reference"""
+    if _text(row['deal_number']):
+        return _text(row['deal_number']).upper()
+    for field in ('narration', 'reference'):
+        match = DEAL_NUMBER_PATTERN.search(_text(row[field]) or '')
+        if match:
+            return match.group(0).upper()
+    return None
+
+
+def statement_key(payment_date, amount, reference, narration, deal_number):
+    """
+    Idempotency key for a statement credit.
+
+    The bank reference (UTR) identifies a credit on its own; rows without
+    one fall back to a hash of their contents.
+    """
+    if reference:
+        return f'statement:{reference}'[:255]
+    digest = hashlib.sha256(
+        '|'.join([payment_date.isoformat(), str(amount), narration or '', deal_number]).encode('utf-8')
+    ).hexdigest()
+    return f'statement:{digest[:40]}'
+
+
+def _parse_row(row):
+    """Report entry for a statement row, plus the data needed to post it"""
+    entry = dict.fromkeys(REPORT_FIELDS)
+    entry['row'] = row['row']
+    entry['reference'] = _text(row['reference'])
+    try:
+        payment_date = _parse_date(row['date'])
+        amount = _parse_amount(row['amount'])
+    except ValueError as e:
+        entry.update(status='invalid', error=str(e))
+        return entry, None
+
+    entry.update(payment_date=payment_date.isoformat(), amount=float(amount))
+    deal_number = _deal_number(row)
+    if not deal_number:
+        entry.update(status='unmatched', error='No deal number found')
+        return entry, None
+
+    entry['deal_number'] = deal_number
+    key = statement_key(payment_date, amount, entry['reference'], _text(row['narration']), deal_number)
+    return entry, {'date': payment_date, 'amount': amount, 'deal_number': deal_number, 'key': key}
+
+
+# ============ POSTING ============
+
+def _post_batch(batch, dry_run):
+    """
+    Match and post one batch of parsed rows.
+
+    All deals of the batch are locked in id order with one query (the order
+    every other payment and accrual writer uses), already imported rows are
+    found with one query on the payments' idempotency keys, and each deal's
+    payments are posted oldest first inside a savepoint so a failing deal
+    does not undo the rest of the batch. The batch commits once.
+    """
+    numbers = sorted({payment['deal_number'] for _, payment in batch})
+    deals = {
+        deal.deal_number.upper(): deal for deal in db.session.execute(
+            select(Deal).where(Deal.deal_number.in_(numbers)).order_by(Deal.id)
+            .with_for_update().execution_options(populate_existing=True)
+        ).scalars()
+    }
+
+    pairs = [(deals[p['deal_number']].id, p['key']) for _, p in batch if p['deal_number'] in deals]
+    posted = set()
+    if pairs:
+        posted = {tuple(row) for row in db.session.execute(
+            select(Payment.deal_id, Payment.idempotency_key).where(
+                tuple_(Payment.deal_id, Payment.idempotency_key).in_(pairs)
+            )
+        )}
+
+    by_deal = {}
+    for entry, payment in batch:
+        deal = deals.get(payment['deal_number'])
+        if deal is None:
+            entry.update(status='unmatched', error='Unknown deal number')
+        elif (deal.id, payment['key']) in posted:
+            entry.update(status='duplicate', error='Already imported')
+        else:
+            entry['status'] = 'matched'
+            by_deal.setdefault(deal.id, (deal, []))[1].append((entry, payment))
+
+    if dry_run:
+        db.session.rollback()
+        return
+
+    for deal_id in sorted(by_deal):
+        deal, payments = by_deal[deal_id]
+        savepoint = db.session.begin_nested()
+        try:
+            for entry, payment in sorted(payments, key=lambda p: (p[1]['date'], p[0]['row'])):
+                result = post_payment(deal, payment['amount'], payment['date'], idempotency_key=payment['key'])
+                entry.update(
+                    payment_id=result['payment_id'],
+                    allocated=float(payment['amount']) - result['remaining_amount'],
+                    unallocated=result['remaining_amount'],
+                    interest_realized=result['total_interest_realized']
+                )
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            for entry, _ in payments:
+                entry.update(status='error', error=str(e), payment_id=None, allocated=None,
+                             unallocated=None, interest_realized=None)
+    db.session.commit()
+
+
+def import_statement_payments(fileobj, filename, dry_run=False, batch_rows=IMPORT_BATCH_ROWS, on_row=None):
+    """
+    Post the credits of a bank statement to their deals.
+
+    The file is read as a stream, ``batch_rows`` rows at a time. Each row is
+    matched to a deal by deal number (a deal number column, or a
+    ``DEAL-XXXXXXXX`` reference in the narration or reference) and posted
+    with the same allocation rules as POST /deals/<id>/payments. Every row
+    carries an idempotency key derived from its bank reference, so
+    importing the same statement again posts nothing new.
+
+    Args:
+        fileobj: Binary file object of a CSV or Excel statement
+        filename: Original file name
+        dry_run: Match and check for duplicates without posting
+        batch_rows: Rows per batch (one transaction each)
+        on_row: Optional callable(dict) receiving each report entry
+
+    Returns:
+        dict with counts per status; entries go to ``on_row``
+    """
+    summary = {'rows': 0, 'matched': 0, 'unmatched': 0, 'duplicate': 0, 'invalid': 0, 'error': 0,
+               'amount_posted': Decimal('0')}
+    seen = set()
+
+    def flush(entries, batch):
+        if batch:
+            _post_batch(batch, dry_run)
+        for entry in entries:
+            summary['rows'] += 1
+            summary[entry['status']] += 1
+            if entry['status'] == 'matched' and not dry_run:
+                summary['amount_posted'] += Decimal(str(entry['amount']))
+            if on_row:
+                on_row(entry)
+
+    entries, batch = [], []
+    for row in iter_statement_rows(fileobj, filename):
+        entry, payment = _parse_row(row)
+        entries.append(entry)
+        if payment is not None:
+            if payment['key'] in seen:
+                entry.update(status='duplicate', error='Repeated in statement')
+            else:
+                seen.add(payment['key'])
+                batch.append((entry, payment))
+        if len(entries) >= batch_rows:
+            flush(entries, batch)
+            entries, batch = [], []
+    flush(entries, batch)
+
+    summary['amount_posted'] = float(summary['amount_posted'])
+    return summary
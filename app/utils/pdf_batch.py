@@ -0,0 +1,150 @@
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from sqlalchemy.orm import selectinload
+import zipfile
+from app.utils.pdf_generator import (
+    render_bill_pdf_bytes,
+    format_farmer_bill_for_pdf, format_dealer_bill_for_pdf,
+    FARMER_TEMPLATE_VERSION, DEALER_TEMPLATE_VERSION
+)
+
+PDF_FORMATTERS = {
+    'farmer': (format_farmer_bill_for_pdf, FARMER_TEMPLATE_VERSION),
+    'dealer': (format_dealer_bill_for_pdf, DEALER_TEMPLATE_VERSION),
+}
+
+
+def build_batch_query(bill_model, bill_ids=None, date_from=None, date_to=None):
+    """
+    Select the bills for a batch export, oldest first, with items preloaded.
+
+    Args:
+        bill_model: FarmerBill or DealerBill
+        bill_ids: List (or comma separated string) of bill_id values
+        date_from: Inclusive start date 'YYYY-MM-DD'
+        date_to: Inclusive end date 'YYYY-MM-DD'
+    """
+    query = bill_model.query.options(selectinload(bill_model.items))
+
+    if bill_ids:
+        if isinstance(bill_ids, str):
+            bill_ids = [b.strip() for b in bill_ids.split(',') if b.strip()]
+        query = query.filter(bill_model.bill_id.in_(bill_ids))
+    elif date_from and date_to:
+        query = query.filter(
+            bill_model.date >= datetime.strptime(date_from, '%Y-%m-%d').date(),
+            bill_model.date <= datetime.strptime(date_to, '%Y-%m-%d').date()
+        )
+    else:
+        raise ValueError('Provide bill_ids or both date_from and date_to')
+
+    return query.order_by(bill_model.date, bill_model.bill_id)
+
+
+def batch_zip_filename(kind, date_from=None, date_to=None):
+    return f"{kind}_bills_{date_from or 'selected'}_{date_to or ''}".rstrip('_') + '.zip'
+
+
+def iter_bill_pdfs(kind, bills, pool, cache):
+    """
+    Render PDFs for an iterable of bills in parallel, yielding in input order.
+
+    At most ``pool.batch_window`` renders are in flight, so memory stays
+    bounded regardless of how many bills the iterable produces. Cached PDFs
+    are reused and fresh renders are written back to the cache.
+
+    A bill that fails to render (an error, a timeout, a busy pool) is
+    yielded with its error instead of ending the iteration, since a
+    streamed response has already sent its headers by then.
+
+    Yields:
+        (bill_id, pdf_bytes, error) with exactly one of pdf_bytes and error set
+    """
+    format_bill, template_version = PDF_FORMATTERS[kind]
+    pending = deque()
+
+    def finish(entry):
+        bill_id, key, future, data = entry
+        if future is not None:
+            try:
+                data = pool.result(future)
+            except Exception as e:
+                return bill_id, None, str(e) or type(e).__name__
+            cache.put(key, data)
+        return bill_id, data, None
+
+    for bill in bills:
+        try:
+            bill_dict = format_bill(bill)
+            key = cache.make_key(kind, template_version, bill_dict)
+            data = cache.get(key)
+            future = None
+            if data is None:
+                future = pool.submit_waiting(render_bill_pdf_bytes, kind, bill_dict)
+        except Exception as e:
+            # Settled here, so it keeps its place in the output order
+            key, future, data = None, Future(), None
+            future.set_exception(e)
+        pending.append((bill.bill_id, key, future, data))
+
+        while len(pending) >= pool.batch_window:
+            yield finish(pending.popleft())
+
+    while pending:
+        yield finish(pending.popleft())
+
+
+def batch_zip_entries(kind, pdfs):
+    """
+    ZIP members for the output of ``iter_bill_pdfs``: one PDF per rendered
+    bill, then an ``errors.txt`` listing the bills that failed, if any.
+    """
+    errors = []
+    for bill_id, data, error in pdfs:
+        if error is None:
+            yield f'{kind}_bill_{bill_id}.pdf', data
+        else:
+            errors.append(f'{kind}_bill_{bill_id}: {error}')
+    if errors:
+        yield 'errors.txt', '\n'.join(errors) + '\n'
+
+
+class _ZipSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Build a ZIP archive incrementally from (filename, bytes) pairs.
+
+    zipfile falls back to data descriptors on a non-seekable sink, so each
+    member is emitted as soon as it is written and only one PDF is held at
+    a time.
+    """
+    sink = _ZipSink()
+    # PDFs are already compressed; storing them avoids burning CPU for nothing
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as zf:
+        for filename, data in entries:
+            zf.writestr(filename, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
@@ -0,0 +1,222 @@
+from flask import current_app
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class PdfCache:
+    """
+    Disk-backed, size-bounded LRU cache for rendered bill PDFs.
+
+    Entries are content-addressed: the key is a hash of the bill's serialized
+    contents plus the template version, so an edited bill or a changed
+    template produces a new key and a stale PDF can never be returned.
+    Recency is tracked through file mtimes, which lets several worker
+    processes share one cache directory. The total size is kept in a file
+    in that directory and updated under an exclusive ``flock``, so
+    ``max_bytes`` bounds the directory as a whole, not each process.
+    """
+
+    suffix = '.pdf'
+    size_file = '.size'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(kind, template_version, bill_data):
+        payload = json.dumps(bill_data, sort_keys=True, default=str)
+        digest = hashlib.sha256()
+        digest.update(f'{kind}:{template_version}:'.encode('utf-8'))
+        digest.update(payload.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}{self.suffix}')
+
+    def _entries(self):
+        """(path, mtime, size) for every cached file"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, st.st_mtime, st.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Touch so the entry counts as recently used
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            self._replace(tmp_path, key, len(data))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _shared_size(self):
+        """
+        Lock the cache directory and yield its total size as a one-item list.
+
+        The lock is held across threads (``self._lock``) and processes
+        (``flock`` on the size file); the value left in the list is written
+        back. A missing size file is rebuilt from a directory scan.
+        """
+        with self._lock, open(os.path.join(self.directory, self.size_file), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                text = f.read().strip()
+                total = [int(text) if text else sum(size for _, _, size in self._entries())]
+                yield total
+                f.seek(0)
+                f.truncate()
+                f.write(str(total[0]))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _replace(self, tmp_path, key, size):
+        """
+        Move a finished temp file into place and account for its size.
+
+        When another thread or process already stored the same key, only the
+        difference to the file being replaced is added, so the tracked size
+        does not drift upwards.
+        """
+        path = self._path(key)
+        with self._shared_size() as total:
+            try:
+                old_size = os.stat(path).st_size
+            except FileNotFoundError:
+                old_size = 0
+            # Atomic rename: readers never see a partially written file
+            os.replace(tmp_path, path)
+            total[0] += size - old_size
+            if total[0] > self.max_bytes:
+                total[0] = self._evict()
+
+    def _evict(self):
+        """
+        Drop least recently used entries until 90% of the size bound.
+
+        Caller holds the shared size lock. Returns the remaining total, taken
+        from a directory scan so any drift in the size file is corrected.
+        """
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def get_or_render(self, kind, template_version, bill_data, render):
+        """
+        Return cached PDF bytes, rendering and storing them on a miss.
+
+        Args:
+            kind: 'farmer' or 'dealer'
+            template_version: Version string of the template used by ``render``
+            bill_data: Formatted bill dict passed to the template
+            render: Zero-argument callable returning PDF bytes
+        """
+        key = self.make_key(kind, template_version, bill_data)
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        """Hit and eviction counts of this process, size of the whole directory"""
+        with self._shared_size() as total:
+            size = total[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'size_bytes': size,
+                'max_bytes': self.max_bytes,
+                'directory': self.directory
+            }
+
+
+class _NullPdfCache:
+    """Stand-in used when caching is disabled (PDF_CACHE_MAX_BYTES = 0)"""
+
+    make_key = staticmethod(PdfCache.make_key)
+
+    def get(self, key):
+        return None
+
+    def put(self, key, data):
+        pass
+
+    def get_or_render(self, kind, template_version, bill_data, render):
+        return render()
+
+    def stats(self):
+        return {'enabled': False}
+
+
+# Guards first-use creation so concurrent request threads share one cache
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """Return the PDF cache for the current app, creating it on first use"""
+    cache = current_app.extensions.get('pdf_cache')
+    if cache is None:
+        with _pdf_cache_lock:
+            cache = current_app.extensions.get('pdf_cache')
+            if cache is None:
+                max_bytes = current_app.config.get('PDF_CACHE_MAX_BYTES', 0)
+                if max_bytes > 0:
+                    cache = PdfCache(current_app.config['PDF_CACHE_DIR'], max_bytes)
+                else:
+                    cache = _NullPdfCache()
+                current_app.extensions['pdf_cache'] = cache
+    return cache
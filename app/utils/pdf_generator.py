@@ -2,6 +2,7 @@ from flask import current_app
 from jinja2 import Template
 from xhtml2pdf import pisa
 from io import BytesIO
+import hashlib
 
 FARMER_BILL_TEMPLATE = """
 <!DOCTYPE html>
@@ -45,7 +46,7 @@ FARMER_BILL_TEMPLATE = """
             </tr>
         </thead>
         <tbody>
-            {% for item in bill.items %}
+            {% for item in bill['items'] %}
             <tr>
                 <td>{{ item.item }}</td>
                 <td class="text-right">{{ item.weight }}</td>
@@ -108,7 +109,7 @@ DEALER_BILL_TEMPLATE = """
             </tr>
         </thead>
         <tbody>
-            {% for item in bill.items %}
+            {% for item in bill['items'] %}
             <tr>
                 <td>{{ item.item }}</td>
                 <td class="text-right">{{ item.weight }}</td>
@@ -133,6 +134,36 @@ DEALER_BILL_TEMPLATE = """
 </html>
 """
 
+# Bumped automatically whenever a template changes, so cached PDFs rendered
+# from an older template are never served
+FARMER_TEMPLATE_VERSION = hashlib.sha256(FARMER_BILL_TEMPLATE.encode('utf-8')).hexdigest()[:16]
+DEALER_TEMPLATE_VERSION = hashlib.sha256(DEALER_BILL_TEMPLATE.encode('utf-8')).hexdigest()[:16]
+
+def _format_items_for_pdf(bill_dict):
+    for item in bill_dict['items']:
+        item['weight'] = f"{item['weight']:.2f}"
+        item['price'] = f"{item['price']:.2f}"
+        item['item_total'] = f"{item['item_total']:.2f}"
+
+def format_farmer_bill_for_pdf(bill):
+    """Serialize a FarmerBill with dates and numbers formatted for the template"""
+    bill_dict = bill.to_dict()
+    bill_dict['date'] = bill.date.strftime('%Y-%m-%d')
+    _format_items_for_pdf(bill_dict)
+    bill_dict['other_expense'] = f"{bill_dict['other_expense']:.2f}"
+    bill_dict['discount'] = f"{bill_dict['discount']:.2f}"
+    bill_dict['final_total'] = f"{bill_dict['final_total']:.2f}"
+    return bill_dict
+
+def format_dealer_bill_for_pdf(bill):
+    """Serialize a DealerBill with dates and numbers formatted for the template"""
+    bill_dict = bill.to_dict()
+    bill_dict['date'] = bill.date.strftime('%Y-%m-%d')
+    _format_items_for_pdf(bill_dict)
+    for key in ('other_expense', 'discount', 'gst_percentage', 'gst_amount', 'cgst', 'sgst', 'grand_total'):
+        bill_dict[key] = f"{bill_dict[key]:.2f}"
+    return bill_dict
+
 def generate_farmer_bill_pdf(bill_data):
     """Generate PDF for farmer bill"""
     template = Template(FARMER_BILL_TEMPLATE)
@@ -157,3 +188,14 @@ def generate_dealer_bill_pdf(bill_data):
     pdf_buffer.seek(0)
     return pdf_buffer
 
+def render_bill_pdf_bytes(kind, bill_data):
+    """
+    Render a formatted bill dict to PDF bytes.
+
+    Module-level so it can be pickled and run in a worker process.
+    """
+    if kind == 'farmer':
+        return generate_farmer_bill_pdf(bill_data).getvalue()
+    if kind == 'dealer':
+        return generate_dealer_bill_pdf(bill_data).getvalue()
+    raise ValueError(f'Unknown bill kind: {kind}')
@@ -0,0 +1,175 @@
+from flask import current_app
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import threading
+from app.utils.pdf_generator import render_bill_pdf_bytes
+
+
+class PdfPoolBusy(Exception):
+    """Raised when the render queue is full; the client should retry later"""
+
+    def __init__(self, retry_after):
+        super().__init__('PDF rendering is busy, please retry shortly')
+        self.retry_after = retry_after
+
+
+class PdfRenderTimeout(Exception):
+    """Raised when a render does not finish within the configured timeout"""
+
+
+class PdfRenderPool:
+    """
+    Bounded process pool for xhtml2pdf rendering.
+
+    xhtml2pdf is CPU-bound and holds the GIL, so rendering in the request
+    thread stalls every other request on the worker. Renders run in
+    separate processes instead. At most ``max_pending`` renders may be
+    queued or running at once; beyond that ``PdfPoolBusy`` is raised
+    immediately rather than waiting without bound.
+
+    A render that is still running when its caller times out cannot be
+    cancelled, so the pool is recycled instead: its worker processes are
+    terminated and a fresh pool takes over. Other renders that were in the
+    old pool fail with ``PdfPoolBusy`` and can be retried.
+    """
+
+    def __init__(self, workers, max_pending, timeout, retry_after, start_method='spawn'):
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.max_pending = max_pending
+        self._workers = workers
+        self._mp_context = multiprocessing.get_context(start_method)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+        atexit.register(self.shutdown)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=self._mp_context)
+
+    def _submit(self, fn, *args):
+        """Submit to the current executor; the caller holds a slot"""
+        try:
+            with self._executor_lock:
+                executor = self._executor
+                future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.executor = executor
+        # The slot is held until the render really finishes, even if the
+        # caller stopped waiting, so the bound reflects actual pool load
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit(self, fn, *args):
+        """Queue ``fn(*args)`` in the pool, or raise PdfPoolBusy when full"""
+        if not self._slots.acquire(blocking=False):
+            raise PdfPoolBusy(self.retry_after)
+        return self._submit(fn, *args)
+
+    def submit_waiting(self, fn, *args):
+        """Like ``submit`` but waits up to ``timeout`` seconds for a free slot"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PdfPoolBusy(self.retry_after)
+        return self._submit(fn, *args)
+
+    def _recycle(self, executor):
+        """Replace ``executor`` with a fresh pool and terminate its workers"""
+        with self._executor_lock:
+            if self._executor is not executor:
+                # Already recycled for another timed-out render
+                return
+            self._executor = self._new_executor()
+        # No public way to kill an executor's workers before Python 3.14
+        # (terminate_workers); shutdown() alone leaves a hung render running
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            # Futures of killed workers fail with BrokenProcessPool, which
+            # releases their slots
+            process.terminate()
+
+    @property
+    def batch_window(self):
+        """Renders a batch job may keep in flight, leaving room for interactive requests"""
+        return max(1, self.max_pending // 2)
+
+    def result(self, future):
+        """Wait for a submitted render, raising PdfRenderTimeout after ``timeout``"""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                self._recycle(future.executor)
+                # Settles (and frees its slot) once the pool notices the
+                # terminated worker
+                wait([future], timeout=self.timeout)
+            raise PdfRenderTimeout(f'PDF rendering timed out after {self.timeout}s')
+        except BrokenProcessPool:
+            # The pool was recycled under this render
+            raise PdfPoolBusy(self.retry_after)
+
+    def run(self, fn, *args):
+        """Run ``fn(*args)`` in the pool and wait up to ``timeout`` seconds"""
+        return self.result(self.submit(fn, *args))
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor = self._executor
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _InlineRenderPool:
+    """Renders in the calling thread (PDF_POOL_WORKERS = 0)"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    submit_waiting = submit
+    batch_window = 1
+
+    def result(self, future):
+        return future.result()
+
+    def run(self, fn, *args):
+        return fn(*args)
+
+
+# Guards first-use creation; a second pool would leak its worker processes
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """Return the PDF render pool for the current app, creating it on first use"""
+    pool = current_app.extensions.get('pdf_pool')
+    if pool is None:
+        with _pdf_pool_lock:
+            pool = current_app.extensions.get('pdf_pool')
+            if pool is None:
+                config = current_app.config
+                workers = config.get('PDF_POOL_WORKERS', 0)
+                if workers > 0:
+                    pool = PdfRenderPool(
+                        workers=workers,
+                        max_pending=config.get('PDF_POOL_MAX_PENDING') or workers * 4,
+                        timeout=config.get('PDF_RENDER_TIMEOUT', 30),
+                        retry_after=config.get('PDF_RETRY_AFTER', 5),
+                        start_method=config.get('PDF_POOL_START_METHOD', 'spawn')
+                    )
+                else:
+                    pool = _InlineRenderPool()
+                current_app.extensions['pdf_pool'] = pool
+    return pool
+
+
+def render_bill_pdf(kind, bill_data):
+    """Render a formatted bill dict to PDF bytes through the app's pool"""
+    return get_pdf_pool().run(render_bill_pdf_bytes, kind, bill_data)
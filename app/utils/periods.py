@@ -0,0 +1,36 @@
+from datetime import date
+
+
+def period_bounds(month=None, year=None):
+    """
+    Convert month/year parameters into a half-open date range.
+
+    Returns:
+        (start, end) with start inclusive and end exclusive, or None when no
+        year is given (a month on its own does not filter, as before)
+    """
+    if not year:
+        return None
+    year = int(year)
+    if month:
+        month = int(month)
+        if not 1 <= month <= 12:
+            raise ValueError('month must be between 1 and 12')
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return start, end
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def filter_by_period(query, date_column, month=None, year=None):
+    """
+    Restrict a query to a month/year (or whole year) on ``date_column``.
+
+    Comparing the bare column against a range keeps the B-tree index on it
+    usable, unlike EXTRACT(month/year FROM column).
+    """
+    bounds = period_bounds(month, year)
+    if bounds is None:
+        return query
+    start, end = bounds
+    return query.filter(date_column >= start, date_column < end)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: integer-paise bill totals vs the previous Decimal/float code.
+
+Usage:
+    python bench_calculations.py [items] [repeats]
+"""
+import random
+import sys
+import timeit
+from decimal import Decimal
+from app.utils.calculations import calculate_farmer_bill_totals, calculate_dealer_bill_totals
+
+
+def legacy_farmer_bill_totals(items, other_expense=0, discount=0):
+    """The Decimal -> float -> sum -> Decimal(str()) implementation being replaced"""
+    item_totals = []
+    for item in items:
+        weight = Decimal(str(item.get('weight', 0)))
+        price = Decimal(str(item.get('price', 0)))
+        item_total = weight * price
+        item_totals.append(float(item_total))
+        item['item_total'] = float(item_total)
+
+    sub_total = Decimal(str(sum(item_totals)))
+    final_total = sub_total + Decimal(str(other_expense)) - Decimal(str(discount))
+    return {'item_totals': item_totals, 'final_total': float(final_total)}
+
+
+def legacy_dealer_bill_totals(items, other_expense=0, discount=0, gst_percentage=18):
+    item_totals = []
+    for item in items:
+        weight = Decimal(str(item.get('weight', 0)))
+        price = Decimal(str(item.get('price', 0)))
+        item_total = weight * price
+        item_totals.append(float(item_total))
+        item['item_total'] = float(item_total)
+
+    sub_total = Decimal(str(sum(item_totals)))
+    sub_total_after_expenses = sub_total + Decimal(str(other_expense)) - Decimal(str(discount))
+    gst_amount = (sub_total_after_expenses * Decimal(str(gst_percentage))) / Decimal('100')
+    return {
+        'gst_amount': float(gst_amount),
+        'cgst': float(gst_amount / Decimal('2')),
+        'sgst': float(gst_amount / Decimal('2')),
+        'grand_total': float(sub_total_after_expenses + gst_amount)
+    }
+
+
+def make_items(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        {'weight': round(rng.uniform(1, 5000), 2), 'price': round(rng.uniform(1, 500), 2)}
+        for _ in range(count)
+    ]
+
+
+def bench(label, fn, items, repeats):
+    # Items are reused across runs; both implementations only add item_total
+    seconds = min(timeit.repeat(lambda: fn(items, 150.5, 20), number=1, repeat=repeats))
+    print(f'{label:<28} {seconds * 1000:9.2f} ms  ({seconds / len(items) * 1e6:.2f} us/item)')
+    return seconds
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    items = make_items(count)
+
+    print(f'{count} items, best of {repeats}')
+    old = bench('legacy farmer totals', legacy_farmer_bill_totals, items, repeats)
+    new = bench('paise farmer totals', calculate_farmer_bill_totals, items, repeats)
+    print(f'  speedup x{old / new:.2f}')
+    old = bench('legacy dealer totals', legacy_dealer_bill_totals, items, repeats)
+    new = bench('paise dealer totals', calculate_dealer_bill_totals, items, repeats)
+    print(f'  speedup x{old / new:.2f}')
+
+    legacy = legacy_dealer_bill_totals([dict(i) for i in items], 150.5, 20)
+    current = calculate_dealer_bill_totals([dict(i) for i in items], 150.5, 20)
+    print(f"grand_total legacy={legacy['grand_total']!r} paise={current['grand_total']!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Benchmark the report writers on synthetic rows (no database needed).
+
+Usage:
+    python bench_exports.py [rows]
+"""
+import random
+import sys
+import time
+from app.reports.exports import DEALER_COLUMNS, DEALER_FIELDS, write_xlsx, write_parquet, iter_csv, iter_ndjson
+
+
+def make_rows(count, seed=42):
+    rng = random.Random(seed)
+    for i in range(count):
+        weight = round(rng.uniform(1, 5000), 2)
+        price = round(rng.uniform(1, 500), 2)
+        item_total = round(weight * price, 2)
+        gst = round(item_total * 0.18, 2)
+        yield [
+            f'bill-{i // 3:08d}', '2026-01-15', f'Customer {i % 997}', 'Wheat',
+            weight, price, item_total, 0.0, 0.0, 18.0, gst, gst / 2, gst / 2, item_total + gst
+        ]
+
+
+def size_of(fileobj):
+    fileobj.seek(0, 2)
+    return fileobj.tell()
+
+
+def bench(label, build, count):
+    start = time.perf_counter()
+    size = build(make_rows(count))
+    elapsed = time.perf_counter() - start
+    print(f'{label:<8} {elapsed:8.2f} s  {count / elapsed:10.0f} rows/s  {size / 1024 / 1024:8.2f} MB')
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'{count} dealer report rows')
+    baseline = bench('xlsx', lambda rows: size_of(write_xlsx('Dealer Bills', DEALER_COLUMNS, rows)), count)
+    for label, build in [
+        ('csv', lambda rows: sum(len(c.encode('utf-8')) for c in iter_csv(DEALER_COLUMNS, rows))),
+        ('ndjson', lambda rows: sum(len(c.encode('utf-8')) for c in iter_ndjson(DEALER_FIELDS, rows))),
+        ('parquet', lambda rows: size_of(write_parquet(DEALER_FIELDS, rows))),
+    ]:
+        elapsed = bench(label, build, count)
+        print(f'         x{baseline / elapsed:.1f} faster than xlsx')
+
+
+if __name__ == '__main__':
+    main()
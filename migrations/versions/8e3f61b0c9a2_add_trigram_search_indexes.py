@@ -0,0 +1,42 @@
+"""Add pg_trgm GIN indexes for customer and bill-id search
+
+Revision ID: 8e3f61b0c9a2
+Revises: 5c1e9a7d2b40
+Create Date: 2026-10-17 11:03:27.514920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f61b0c9a2'
+down_revision = '5c1e9a7d2b40'
+branch_labels = None
+depends_on = None
+
+
+TRGM_INDEXES = [
+    ('ix_farmer_bills_customer_name_trgm', 'farmer_bills', 'customer_name'),
+    ('ix_farmer_bills_bill_id_trgm', 'farmer_bills', 'bill_id'),
+    ('ix_dealer_bills_customer_name_trgm', 'dealer_bills', 'customer_name'),
+    ('ix_dealer_bills_bill_id_trgm', 'dealer_bills', 'bill_id'),
+    ('ix_deals_customer_name_trgm', 'deals', 'customer_name'),
+    ('ix_deals_deal_number_trgm', 'deals', 'deal_number'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name, table, [column], unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    # The pg_trgm extension is left installed; other objects may depend on it
+    for name, table, column in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,112 @@
+"""
+Shared fixtures.
+
+Tests run against PostgreSQL when ``TEST_DATABASE_URL`` is set (the
+database is emptied and rebuilt for every test). Without it they fall back
+to in-memory SQLite, with the few PostgreSQL-only schema features adapted;
+tests that need PostgreSQL itself are skipped there.
+"""
+from config import Config
+from app import create_app, db
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.sqltypes import Uuid
+import os
+import pytest
+import uuid
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+requires_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = TEST_DATABASE_URL or 'sqlite://'
+    PDF_CACHE_MAX_BYTES = 0
+    PDF_POOL_WORKERS = 0
+    REPORT_CACHE_MAX_BYTES = 0
+
+
+# ============ SQLITE ADAPTATIONS ============
+
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+def _adapt_schema_for_sqlite():
+    """Partial indexes keep their WHERE clause, ids in URLs bind as strings"""
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            where = index.dialect_options['postgresql']['where']
+            if where is not None:
+                index.dialect_options['sqlite']['where'] = where
+
+    # psycopg2 accepts UUID strings (ids straight from the URL); SQLite's
+    # Uuid processor only takes uuid.UUID
+    if getattr(Uuid.bind_processor, '_accepts_strings', False):
+        return
+    original = Uuid.bind_processor
+
+    def bind_processor(self, dialect):
+        process = original(self, dialect)
+        if process is None:
+            return None
+        return lambda value: process(uuid.UUID(value) if isinstance(value, str) else value)
+
+    bind_processor._accepts_strings = True
+    Uuid.bind_processor = bind_processor
+
+
+# ============ FIXTURES ============
+
+@pytest.fixture
+def app(tmp_path):
+    class Settings(TestConfig):
+        JOBS_DIR = str(tmp_path / 'jobs')
+
+    app = create_app(Settings)
+    with app.app_context():
+        if TEST_DATABASE_URL:
+            with db.engine.begin() as conn:
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            db.drop_all()
+        else:
+            _adapt_schema_for_sqlite()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Context manager collecting the SQL statements sent while it is open::
+
+        with count_queries() as statements:
+            client.get('/api/farmer-bills')
+        assert len(statements) == 2
+    """
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return counter
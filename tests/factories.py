@@ -0,0 +1,56 @@
+"""Builders for test data, going through the same code paths as the API"""
+from app.utils.bill_ingest import bulk_create_bills
+from datetime import date, timedelta
+
+
+def bill_payload(bill_date, items=2):
+    return {
+        'date': bill_date.isoformat(),
+        'customer_name': 'Test Customer',
+        'items': [
+            {
+                'item': f'Item {n}', 'hsn_code': '1001', 'quantity_bags': 2,
+                'weight': 100, 'price': 25, 'item_total': 2500
+            }
+            for n in range(items)
+        ]
+    }
+
+
+def create_bills(kind, count, start=date(2024, 1, 1), items=2):
+    """Insert ``count`` bills of ``kind`` on consecutive days from ``start``"""
+    payloads = [bill_payload(start + timedelta(days=n % 28), items) for n in range(count)]
+    results = bulk_create_bills(kind, payloads)
+    assert all(r['status'] == 'created' for r in results)
+    return results
+
+
+def create_deal(client, installments=4, payments=3, interest_percentage=12):
+    """
+    Create a deal through the API with monthly installments from January
+    2024 and weekly payments against them (each payment allocates to one
+    or more installments).
+
+    Returns:
+        The deal id
+    """
+    response = client.post('/api/deals', json={
+        'customer_name': 'Test Farmer',
+        'total_amount': 1000 * installments,
+        'interest_percentage': interest_percentage,
+        'deal_date': '2024-01-01',
+        'installments': [
+            {'due_date': date(2024, month, 1).isoformat(), 'amount': 1000}
+            for month in range(1, installments + 1)
+        ]
+    })
+    assert response.status_code == 201
+    deal_id = response.get_json()['id']
+
+    for n in range(payments):
+        response = client.post(f'/api/deals/{deal_id}/payments', json={
+            'amount': 1500,
+            'payment_date': (date(2024, 2, 1) + timedelta(days=7 * n)).isoformat()
+        })
+        assert response.status_code == 201
+    return deal_id
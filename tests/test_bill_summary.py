@@ -0,0 +1,23 @@
+from app import db
+from app.models import BillDailySummary, DealerBill
+from app.utils.bill_summary import rebuild_bill_summaries
+from sqlalchemy import func, select, update
+from tests.factories import create_bills
+
+
+def test_rebuild_derives_cgst_for_bills_stored_without_it(app):
+    create_bills('dealer', 3)
+    # Dealer bills created before cgst was stored
+    db.session.execute(update(DealerBill).values(cgst=0))
+    db.session.commit()
+
+    rebuild_bill_summaries('dealer')
+
+    expected = db.session.execute(
+        select(func.sum(DealerBill.gst_amount - DealerBill.sgst))
+    ).scalar()
+    summary = db.session.execute(
+        select(func.sum(BillDailySummary.cgst)).where(BillDailySummary.kind == 'dealer')
+    ).scalar()
+    assert expected > 0
+    assert summary == expected
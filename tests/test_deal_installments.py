@@ -0,0 +1,23 @@
+from app.utils.deal_balances import check_deal_balances
+from tests.factories import create_deal
+import uuid
+
+
+def test_added_installments_keep_balances_consistent(client):
+    deal_id = create_deal(client, installments=4, payments=3)
+
+    response = client.post(f'/api/deals/{deal_id}/installments', json={
+        'installments': [{'due_date': '2024-06-01', 'amount': 750}]
+    })
+
+    assert response.status_code == 201
+    assert any(i['due_date'] == '2024-06-01' for i in response.get_json()['installments'])
+    assert check_deal_balances()['mismatches'] == 0
+
+
+def test_add_installments_to_unknown_deal(client):
+    response = client.post(f'/api/deals/{uuid.uuid4()}/installments', json={
+        'installments': [{'due_date': '2024-06-01', 'amount': 750}]
+    })
+
+    assert response.status_code == 404
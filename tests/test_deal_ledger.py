@@ -0,0 +1,41 @@
+from tests.factories import create_deal
+
+
+def _pages(client, url, limit, **params):
+    cursor, entries = None, []
+    while True:
+        page = client.get(url, query_string={'limit': limit, **params, **({'cursor': cursor} if cursor else {})})
+        assert page.status_code == 200
+        data = page.get_json()
+        entries.extend(data['ledger'])
+        cursor = data['next_cursor']
+        if cursor is None:
+            return entries
+
+
+def test_cursor_pages_continue_running_balance(client):
+    deal_id = create_deal(client, installments=6, payments=5)
+    full = client.get(f'/api/deals/{deal_id}/ledger').get_json()['ledger']
+
+    paged = _pages(client, f'/api/deals/{deal_id}/ledger', limit=3)
+
+    assert len(full) > 3
+    assert [(e['id'], e['balance']) for e in paged] == [(e['id'], e['balance']) for e in full]
+
+
+def test_date_from_page_opens_with_earlier_balance(client):
+    deal_id = create_deal(client, installments=6, payments=5)
+    full = client.get(f'/api/deals/{deal_id}/ledger').get_json()['ledger']
+
+    paged = _pages(client, f'/api/deals/{deal_id}/ledger', limit=2, date_from='2024-03-01')
+
+    expected = [(e['id'], e['balance']) for e in full if e['date'] >= '2024-03-01']
+    assert [(e['id'], e['balance']) for e in paged] == expected
+
+
+def test_malformed_cursor_is_rejected(client):
+    deal_id = create_deal(client, installments=2, payments=0)
+
+    response = client.get(f'/api/deals/{deal_id}/ledger?cursor=not-a-cursor')
+
+    assert response.status_code == 400
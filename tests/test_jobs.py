@@ -0,0 +1,101 @@
+from app import db
+from app.jobs.runners import JOB_RUNNERS
+from app.jobs.worker import _progress_updater, claim_next_job, cleanup_jobs, enqueue_job, run_job
+from app.models import ReportJob
+from datetime import datetime, timedelta
+from sqlalchemy import select
+import os
+import time
+
+
+def _running_job(started_minutes_ago, heartbeat_minutes_ago):
+    job = enqueue_job('farmer_report', {})
+    claim_next_job('test-worker')
+    now = datetime.utcnow()
+    job.started_at = now - timedelta(minutes=started_minutes_ago)
+    job.heartbeat_at = now - timedelta(minutes=heartbeat_minutes_ago)
+    db.session.commit()
+    return job.id
+
+
+def test_cleanup_keeps_long_job_with_recent_heartbeat(app):
+    job_id = _running_job(started_minutes_ago=180, heartbeat_minutes_ago=1)
+
+    summary = cleanup_jobs(stale_minutes=60)
+
+    assert summary['stale'] == 0
+    assert db.session.get(ReportJob, job_id).status == 'running'
+
+
+def test_cleanup_fails_job_without_recent_heartbeat(app):
+    job_id = _running_job(started_minutes_ago=180, heartbeat_minutes_ago=90)
+
+    summary = cleanup_jobs(stale_minutes=60)
+
+    assert summary['stale'] == 1
+    assert db.session.get(ReportJob, job_id).status == 'failed'
+
+
+def test_progress_refreshes_heartbeat_when_percent_is_unchanged(app):
+    job_id = _running_job(started_minutes_ago=180, heartbeat_minutes_ago=90)
+    update_progress = _progress_updater(job_id, heartbeat_interval=0)
+
+    update_progress(1, 1000)
+    db.session.expire_all()
+    first = db.session.get(ReportJob, job_id).heartbeat_at
+    update_progress(2, 1000)
+    db.session.expire_all()
+    job = db.session.get(ReportJob, job_id)
+
+    assert job.progress == 0
+    assert job.heartbeat_at >= first > datetime.utcnow() - timedelta(minutes=1)
+
+
+def test_progress_heartbeat_is_throttled(app, count_queries):
+    job_id = _running_job(started_minutes_ago=1, heartbeat_minutes_ago=1)
+    update_progress = _progress_updater(job_id, heartbeat_interval=3600)
+
+    with count_queries() as statements:
+        update_progress(1, 1000)
+        update_progress(2, 1000)
+        update_progress(3, 1000)
+
+    assert len(statements) == 1
+
+
+def _run_with(monkeypatch, runner):
+    monkeypatch.setitem(JOB_RUNNERS, 'test_job', runner)
+    enqueue_job('test_job', {})
+    return run_job(claim_next_job('test-worker'))
+
+
+def test_heartbeat_is_refreshed_without_progress(app, monkeypatch):
+    app.config['JOB_HEARTBEAT_INTERVAL'] = 0.05
+    beats = []
+
+    def runner(params, output, update_progress):
+        job = db.session.execute(select(ReportJob)).scalar_one()
+        first = job.heartbeat_at
+        time.sleep(0.5)
+        db.session.expire_all()
+        beats.append((first, db.session.get(ReportJob, job.id).heartbeat_at))
+        return 'out.txt', 'text/plain'
+
+    job = _run_with(monkeypatch, runner)
+
+    assert job.status == 'done'
+    first, later = beats[0]
+    assert later > first
+
+
+def test_job_failed_as_stale_is_not_marked_done(app, monkeypatch):
+    def runner(params, output, update_progress):
+        output.write(b'late result')
+        cleanup_jobs(stale_minutes=-1)
+        return 'out.txt', 'text/plain'
+
+    job = _run_with(monkeypatch, runner)
+
+    assert job.status == 'failed'
+    assert job.result_path is None
+    assert os.listdir(app.config['JOBS_DIR']) == []
@@ -0,0 +1,30 @@
+from app import db
+from app.models import FarmerBill
+from sqlalchemy import select
+from tests.factories import create_bills
+import app.utils.pdf_batch as pdf_batch
+import io
+import zipfile
+
+
+def test_failed_render_is_listed_and_archive_stays_valid(client, monkeypatch):
+    create_bills('farmer', 3)
+    bill_ids = db.session.execute(select(FarmerBill.bill_id).order_by(FarmerBill.date, FarmerBill.bill_id)).scalars().all()
+    broken = bill_ids[1]
+
+    def render(kind, bill_dict):
+        if bill_dict['bill_id'] == broken:
+            raise RuntimeError('template error')
+        return b'%PDF-1.4 test'
+
+    monkeypatch.setattr(pdf_batch, 'render_bill_pdf_bytes', render)
+
+    response = client.get('/api/farmer-bills/pdf-batch?date_from=2024-01-01&date_to=2024-01-31')
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [
+            f'farmer_bill_{bill_ids[0]}.pdf', f'farmer_bill_{bill_ids[2]}.pdf', 'errors.txt'
+        ]
+        assert archive.read('errors.txt').decode() == f'farmer_bill_{broken}: template error\n'
@@ -0,0 +1,50 @@
+from app.utils.pdf_cache import PdfCache, get_pdf_cache
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+
+def test_put_same_key_twice_tracks_size_once(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=10_000)
+
+    cache.put('bill', b'x' * 1000)
+    cache.put('bill', b'y' * 600)
+
+    assert cache.stats()['size_bytes'] == 600
+    assert os.path.getsize(tmp_path / 'bill.pdf') == 600
+
+
+def test_size_bound_is_not_hit_by_rewrites(tmp_path):
+    cache = PdfCache(str(tmp_path), max_bytes=3000)
+
+    cache.put('a', b'a' * 1000)
+    for _ in range(5):
+        cache.put('b', b'b' * 1000)
+
+    assert cache.stats()['evictions'] == 0
+    assert cache.get('a') is not None
+
+
+def test_get_pdf_cache_creates_one_instance(app, tmp_path):
+    app.config.update(PDF_CACHE_MAX_BYTES=1024, PDF_CACHE_DIR=str(tmp_path))
+
+    def lookup():
+        with app.app_context():
+            return get_pdf_cache()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        caches = list(executor.map(lambda _: lookup(), range(32)))
+
+    assert len({id(cache) for cache in caches}) == 1
+
+
+def test_size_bound_covers_every_process_sharing_the_directory(tmp_path):
+    # One instance per worker process, all on the same directory
+    caches = [PdfCache(str(tmp_path), max_bytes=4000) for _ in range(3)]
+
+    for n in range(4):
+        for i, cache in enumerate(caches):
+            cache.put(f'{i}-{n}', b'x' * 1000)
+
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith('.pdf'))
+    assert on_disk <= 4000
+    assert caches[0].stats()['size_bytes'] == on_disk
@@ -0,0 +1,15 @@
+from app.utils.pdf_pool import PdfRenderPool, PdfRenderTimeout
+import pytest
+import time
+
+
+def test_hung_render_is_recycled_and_frees_its_slot():
+    pool = PdfRenderPool(workers=1, max_pending=1, timeout=1, retry_after=5, start_method='fork')
+    try:
+        with pytest.raises(PdfRenderTimeout):
+            pool.run(time.sleep, 60)
+
+        # The only slot and worker were held by the hung render
+        assert pool.run(abs, -3) == 3
+    finally:
+        pool.shutdown()
@@ -0,0 +1,60 @@
+"""
+The number of statements per request must not grow with the number of
+bills (or deals) being serialized.
+"""
+from tests.factories import create_bills, create_deal
+import pytest
+
+BILL_KINDS = ['farmer', 'dealer']
+
+BILL_ENDPOINTS = [
+    '/api/{kind}-bills',
+    '/api/{kind}-bills?limit=500',
+    '/api/reports/{kind}/excel',
+    '/api/reports/{kind}/excel?format=csv',
+    '/api/reports/{kind}/excel?year=2024&month=1',
+]
+
+
+def _statements_for(client, count_queries, url):
+    with count_queries() as statements:
+        response = client.get(url)
+        assert response.status_code == 200
+        response.get_data()
+    return len(statements)
+
+
+@pytest.mark.parametrize('kind', BILL_KINDS)
+@pytest.mark.parametrize('endpoint', BILL_ENDPOINTS)
+def test_bill_endpoint_query_count_is_flat(client, count_queries, kind, endpoint):
+    url = endpoint.format(kind=kind)
+
+    create_bills(kind, 5)
+    small = _statements_for(client, count_queries, url)
+
+    create_bills(kind, 45)
+    large = _statements_for(client, count_queries, url)
+
+    assert small == large
+
+
+# Deal graph: deals, installments, payments, allocations (one IN query
+# each); the ledger adds its own merged SQL query
+DEAL_ENDPOINT_STATEMENTS = {
+    '/api/deals': 4,
+    '/api/deals/{id}': 4,
+    '/api/deals/{id}/ledger': 5,
+    '/api/deals/{id}/ledger?limit=5': 2,
+}
+
+
+@pytest.mark.parametrize('endpoint, expected', DEAL_ENDPOINT_STATEMENTS.items())
+def test_deal_endpoint_query_count_is_fixed(client, count_queries, endpoint, expected):
+    deal_ids = [create_deal(client, installments=4, payments=3) for _ in range(3)]
+    url = endpoint.format(id=deal_ids[0])
+
+    assert _statements_for(client, count_queries, url) == expected
+
+    for _ in range(6):
+        create_deal(client, installments=8, payments=6)
+    assert _statements_for(client, count_queries, url) == expected
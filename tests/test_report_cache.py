@@ -0,0 +1,55 @@
+from app import db
+from app.models import ReportDataVersion
+from app.reports.cache import ALL_PERIODS, ReportCache, get_report_cache
+from datetime import date, timedelta
+from sqlalchemy import select
+from tests.factories import bill_payload
+import io
+import pytest
+
+
+def _versions(kind):
+    db.session.expire_all()
+    return dict(db.session.execute(
+        select(ReportDataVersion.period, ReportDataVersion.version).where(ReportDataVersion.kind == kind)
+    ).all())
+
+
+def _bulk_post(client, kind, start, count=3):
+    payloads = [bill_payload(start + timedelta(days=n)) for n in range(count)]
+    response = client.post(f'/api/{kind}-bills/bulk', json={'bills': payloads})
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('kind', ['farmer', 'dealer'])
+def test_bulk_insert_only_bumps_its_own_month(client, kind):
+    _bulk_post(client, kind, date(2024, 1, 10))
+    before = _versions(kind)
+
+    _bulk_post(client, kind, date(2024, 2, 10))
+    after = _versions(kind)
+
+    assert ALL_PERIODS not in after
+    assert after['2024-01'] == before['2024-01']
+    assert after['2024-02'] == before.get('2024-02', 0) + 1
+
+
+def test_bulk_insert_into_other_month_keeps_cached_report(app, client, tmp_path):
+    app.config.update(REPORT_CACHE_MAX_BYTES=10 * 1024 * 1024, REPORT_CACHE_DIR=str(tmp_path / 'reports'))
+    _bulk_post(client, 'farmer', date(2024, 1, 10))
+    january = '/api/reports/farmer/excel?year=2024&month=1'
+
+    assert client.get(january).status_code == 200
+    _bulk_post(client, 'farmer', date(2024, 2, 10))
+    assert client.get(january).status_code == 200
+
+    assert get_report_cache().stats()['hits'] == 1
+
+
+def test_put_file_same_key_twice_tracks_size_once(tmp_path):
+    cache = ReportCache(str(tmp_path), max_bytes=10_000)
+
+    cache.put_file('report', io.BytesIO(b'x' * 1000))
+    cache.put_file('report', io.BytesIO(b'y' * 400))
+
+    assert cache.stats()['size_bytes'] == 400